@@ -1,24 +1,55 @@
 """Main FastAPI application."""
 
-from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Form
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import FastAPI, Depends, HTTPException, File, UploadFile, Form, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
-from secrets import token_hex
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Optional
+import asyncio
+import gc
 import json
+import signal
 
 from .modules import discover_modules
 from .models import ClientRequest, Module, AccessLog
-from .utils.database import SessionLocal, init_db
+from .utils import database
+from .utils.database import SessionLocal, fan_out, init_db, new_token, shard_count
+from .utils.access_tracker import last_accessed
+from .utils.admission import AdmissionMiddleware, admission
+from .utils.analytics import (
+    daily_activity,
+    prune_access_logs,
+    request_activity,
+    rollup_access_logs,
+)
+from .utils.changes import (
+    CHANGES_TOPIC,
+    fetch_changes,
+    notify_changes,
+    oldest_sequence,
+    prune_changes,
+    record_change,
+)
+from .utils.data_viewer import export_ndjson
+from .utils.events import broker, format_sse
+from .utils.search import search_requests, search_supported
 from .utils.file_orchestrator import FileOrchestrator
-from .settings import Settings
+from .settings import Settings, get_settings, reload_settings, subscribe
 
 app = FastAPI(title="FileMaster")
 app.mount("/static", StaticFiles(directory="static"), name="static")
+app.add_middleware(AdmissionMiddleware, controller=admission)
 
 
 def get_db() -> Session:
@@ -56,7 +87,20 @@ class RequestStatus(BaseModel):
     completed_at: datetime | None = None
 
 
-settings: Settings
+class BatchSubmit(BaseModel):
+    modules: dict[int, dict] = Field(min_length=1)
+
+
+settings: Settings = get_settings()
+
+
+@subscribe
+def _apply_settings(settings: Settings, changed: set[str]) -> None:
+    """Propagate reloaded settings to long-lived application objects."""
+    if "UPLOAD_FOLDER" in changed:
+        app.state.orchestrator = FileOrchestrator(settings.UPLOAD_FOLDER)
+    broker.maxsize = settings.SSE_BUFFER_SIZE
+    admission.configure(settings)
 
 
 def load_modules() -> None:
@@ -65,37 +109,132 @@ def load_modules() -> None:
     init_db()
 
 
+STATIC_PAGES = ("index.html", "new_request.html", "customer.html")
+_pages: dict[str, str] = {}
+# Set once ``preload`` has done the one-time startup work in a parent process.
+_preloaded = False
+
+
+def _static_page(name: str) -> HTMLResponse:
+    page = _pages.get(name)
+    if page is None:
+        page = _pages[name] = (Path("static") / name).read_text()
+    return HTMLResponse(page)
+
+
+def run_maintenance() -> None:
+    """Prune old change feed entries and roll up access logs.
+
+    This runs once per deploy from ``preload`` rather than in every worker;
+    otherwise schedule the admin endpoints that do the same work.
+    """
+    fan_out(lambda db: prune_changes(db, settings.CHANGE_RETENTION_DAYS))
+    maintain_access_logs()
+
+
+def preload() -> None:
+    """Do one-time startup work in a server's parent process before it forks.
+
+    Handlers are imported, schemas checked, maintenance run and static
+    pages cached once, so forked workers share them copy-on-write and skip
+    that work at startup. Connections opened here are closed before
+    forking; workers open their own.
+    """
+    global _preloaded
+    load_modules()
+    run_maintenance()
+    for name in STATIC_PAGES:
+        _static_page(name)
+    for shard_engine in database.engines:
+        shard_engine.dispose()
+    # Keep the collector from touching, and so copying, preloaded objects.
+    gc.freeze()
+    _preloaded = True
+
+
 @app.on_event("startup")
 async def startup_event() -> None:
     """Load configuration and then initialize modules."""
-    global settings
-    settings = Settings()
     app.state.settings = settings
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_settings)
+    except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+        # No SIGHUP on this platform, or the loop isn't on the main thread.
+        pass
     app.state.orchestrator = FileOrchestrator(settings.UPLOAD_FOLDER)
-    load_modules()
+    broker.maxsize = settings.SSE_BUFFER_SIZE
+    admission.configure(settings)
+    if not _preloaded:
+        load_modules()
+
+
+def maintain_access_logs() -> dict:
+    """Roll up new access log rows, then prune expired raw rows, per shard."""
+    batch_size = settings.ACCESS_LOG_BATCH_SIZE
+
+    def maintain(db: Session) -> tuple[int, int]:
+        rolled_up = rollup_access_logs(db, batch_size)
+        pruned = prune_access_logs(db, settings.ACCESS_LOG_RETENTION_DAYS, batch_size)
+        return rolled_up, pruned
+
+    results = fan_out(maintain)
+    return {
+        "rolled_up": sum(rolled_up for rolled_up, _ in results),
+        "pruned": sum(pruned for _, pruned in results),
+    }
+
+
+@app.on_event("shutdown")
+def shutdown_event() -> None:
+    """Write any buffered access times before the process exits."""
+    with SessionLocal() as db:
+        last_accessed.flush(db)
 
 
 @app.get("/", response_class=HTMLResponse)
 async def root() -> HTMLResponse:
     """Serve the landing page."""
-    return HTMLResponse(Path("static/index.html").read_text())
+    return _static_page("index.html")
 
 
 @app.get("/admin/new_request", response_class=HTMLResponse)
 async def new_request_page() -> HTMLResponse:
     """Serve the new request creation page."""
-    return HTMLResponse(Path("static/new_request.html").read_text())
+    return _static_page("new_request.html")
 
 
 @app.get("/customer", response_class=HTMLResponse)
 async def customer_interface() -> HTMLResponse:
     """Serve the customer interface."""
-    return HTMLResponse(Path("static/customer.html").read_text())
+    return _static_page("customer.html")
+
+
+def _payload_etag(req: ClientRequest) -> str:
+    return f'"{req.id}-{req.version}"'
+
+
+def _etag_matches(etag: str, if_none_match: str | None) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _bump_version(req: ClientRequest) -> None:
+    """Invalidate cached customer payloads for ``req`` at the next flush."""
+    req.version = ClientRequest.version + 1
 
 
 @app.get("/customer/{token}")
-async def get_customer_request(token: str, db: Session = Depends(get_db)):
-    """Get request data for customer view."""
+async def get_customer_request(
+    token: str, request: Request, db: Session = Depends(get_db)
+):
+    """Get request data for customer view.
+
+    Responses carry an ETag derived from the request's payload version, so
+    polling clients revalidate with ``If-None-Match`` and get a ``304``
+    without the modules being loaded or serialized.
+    """
     req = db.query(ClientRequest).filter(ClientRequest.token == token).first()
     if not req:
         raise HTTPException(status_code=404, detail="Invalid token")
@@ -104,19 +243,16 @@ async def get_customer_request(token: str, db: Session = Depends(get_db)):
     if req.expires_at and req.expires_at < datetime.utcnow():
         raise HTTPException(status_code=410, detail="Request has expired")
     
-    # Update last accessed
-    req.last_accessed = datetime.utcnow()
-    
-    # Log access
-    access_log = AccessLog(
-        request_id=req.id,
-        action="view",
-        ip_address="0.0.0.0",  # TODO: Get real IP
-        user_agent="Unknown"   # TODO: Get from request
-    )
-    db.add(access_log)
-    db.commit()
-    
+    # Log the view, including revalidations, and update last accessed; both
+    # are buffered and written in one batch per flush interval
+    last_accessed.record_view(req.id)
+    last_accessed.flush(db, settings.LAST_ACCESSED_FLUSH_SECONDS)
+
+    etag = _payload_etag(req)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(etag, request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+
     modules = [
         {
             "id": m.id,
@@ -130,11 +266,12 @@ async def get_customer_request(token: str, db: Session = Depends(get_db)):
         for m in sorted(req.modules, key=lambda x: x.sort_order)
     ]
     
-    return {
+    payload = {
         "nickname": req.nickname,
         "modules": modules,
         "expires_at": req.expires_at
     }
+    return JSONResponse(jsonable_encoder(payload), headers=headers)
 
 
 @app.get("/customer/module/{module_id}/form", response_class=HTMLResponse)
@@ -197,15 +334,71 @@ async def list_modules() -> list[str]:
     return list(registry.keys())
 
 
+@app.get("/admin/export.ndjson")
+def export_module_results(
+    since: datetime | None = None, kinds: str | None = None
+) -> StreamingResponse:
+    """Stream completed module results across all requests as NDJSON.
+
+    Sensitive fields are only included, decrypted, when
+    ``EXPORT_DECRYPT_SENSITIVE`` is enabled, and request tokens only when
+    ``EXPORT_INCLUDE_TOKENS`` is.
+    """
+    kind_list = [k for k in kinds.split(",") if k] if kinds else None
+    key = None
+    if settings.EXPORT_DECRYPT_SENSITIVE:
+        key = settings.ENCRYPTION_KEY.encode()
+
+    def stream():
+        # The export outlives the request dependency, so it owns its sessions.
+        for shard_session in database.shard_sessions:
+            with shard_session() as db:
+                yield from export_ndjson(
+                    db,
+                    key,
+                    since=since,
+                    kinds=kind_list,
+                    batch_size=settings.EXPORT_BATCH_SIZE,
+                    workers=settings.EXPORT_DECRYPT_WORKERS,
+                    include_token=settings.EXPORT_INCLUDE_TOKENS,
+                )
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/admin/search")
+def search(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """Full-text search over request nicknames and module labels."""
+    if not search_supported(database.engine):
+        raise HTTPException(status_code=501, detail="Search requires SQLite")
+    # Each shard returns its best offset + limit hits; merge them by rank.
+    pages = fan_out(lambda db: search_requests(db, q, offset + limit, 0))
+    results = sorted((hit for page in pages for hit in page), key=lambda h: h["rank"])
+    return {
+        "results": results[offset : offset + limit],
+        "limit": limit,
+        "offset": offset,
+    }
+
+
 @app.post("/requests", response_model=RequestStatus)
 def create_request(data: RequestCreate, db: Session = Depends(get_db)):
     expires_at = None
     if data.expires_days:
         expires_at = datetime.utcnow() + timedelta(days=data.expires_days)
-    req = ClientRequest(token=token_hex(16), nickname=data.nickname, expires_at=expires_at)
+    req = ClientRequest(
+        token=new_token(shard_count), nickname=data.nickname, expires_at=expires_at
+    )
     db.add(req)
+    db.flush()
+    record_change(db, "request_created", req.id)
     db.commit()
     db.refresh(req)
+    notify_changes()
     return RequestStatus(
         id=req.id, token=req.token, modules=[], completed_at=req.completed_at
     )
@@ -225,16 +418,149 @@ def attach_module(
         description=data.description,
         required=data.required,
     )
+    # The new module is outstanding, so the request is no longer complete.
+    req.completed_at = None
+    _bump_version(req)
     db.add(module)
+    db.flush()
+    record_change(db, "module_attached", req.id, module.id)
     db.commit()
     db.refresh(module)
-    return ModuleStatus(
+    status = ModuleStatus(
         id=module.id,
         kind=module.kind,
         label=module.label,
         completed=module.completed,
         completed_at=module.completed_at,
     )
+    broker.publish(request_id, "module_attached", jsonable_encoder(status))
+    notify_changes()
+    return status
+
+
+@app.get("/requests/{request_id}/events")
+async def stream_request_events(
+    request_id: int, request: Request, db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """Stream live progress for a request as server-sent events."""
+    if not db.get(ClientRequest, request_id):
+        raise HTTPException(status_code=404, detail="Request not found")
+    # Release the pooled connection; the stream itself never touches the DB.
+    db.close()
+    heartbeat = settings.SSE_HEARTBEAT_SECONDS
+
+    async def event_stream():
+        subscription = broker.subscribe(request_id)
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                events = await subscription.get(heartbeat)
+                if events is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                if subscription.dropped:
+                    # The client fell behind; tell it to refetch full state.
+                    subscription.dropped = 0
+                    yield format_sse({"event": "resync", "data": None})
+                for message in events:
+                    yield format_sse(message)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/changes")
+async def list_changes(
+    after: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    wait: float = Query(0, ge=0),
+    shard: int = Query(0, ge=0),
+):
+    """Return changes recorded after the ``after`` cursor.
+
+    With ``wait`` set, an empty result is held open until new changes are
+    committed or the wait elapses. Each shard keeps its own sequence, so
+    consumers hold one cursor per shard.
+    """
+    if shard >= len(database.shard_sessions):
+        raise HTTPException(status_code=404, detail="Shard not found")
+    wait = min(wait, settings.CHANGE_FEED_MAX_WAIT)
+    db = database.shard_sessions[shard]()
+
+    def read() -> tuple[list[dict], int | None]:
+        changes = fetch_changes(db, after, limit)
+        oldest = oldest_sequence(db)
+        # End the read transaction so a re-read sees newly committed rows.
+        db.rollback()
+        return changes, oldest
+
+    # Subscribe before reading so a commit between the two isn't missed.
+    subscription = broker.subscribe(CHANGES_TOPIC) if wait else None
+    try:
+        changes, oldest = await run_in_threadpool(read)
+        if not changes and subscription is not None:
+            # Re-read even on timeout to pick up commits from other workers.
+            await subscription.get(wait)
+            changes, oldest = await run_in_threadpool(read)
+    finally:
+        if subscription is not None:
+            broker.unsubscribe(subscription)
+        db.close()
+    return {
+        "changes": changes,
+        "next": changes[-1]["seq"] if changes else after,
+        "oldest": oldest,
+    }
+
+
+@app.post("/admin/analytics/rollup")
+def run_access_log_rollup():
+    """Fold new access log rows into the daily rollups and prune old ones."""
+    return maintain_access_logs()
+
+
+@app.get("/admin/analytics/daily")
+def get_daily_activity(since: date | None = None, until: date | None = None):
+    """Return access counts per day and action from the rollups."""
+    totals: dict[tuple[date, str], int] = {}
+    for rows in fan_out(lambda db: daily_activity(db, since, until)):
+        for row in rows:
+            key = (row["day"], row["action"])
+            totals[key] = totals.get(key, 0) + row["count"]
+    return [
+        {"day": day, "action": action, "count": count}
+        for (day, action), count in sorted(totals.items())
+    ]
+
+
+@app.get("/admin/analytics/requests/{request_id}")
+def get_request_activity(request_id: int, db: Session = Depends(get_db)):
+    """Return daily access counts for one request from the rollups."""
+    return request_activity(db, request_id)
+
+
+@app.post("/admin/settings/reload")
+def reload_app_settings():
+    """Reload settings from the environment without restarting."""
+    return {"changed": sorted(reload_settings())}
+
+
+@app.get("/admin/admission")
+def admission_stats() -> dict:
+    """Report concurrency, queue depth and rejections per route class."""
+    return admission.stats()
+
+
+@app.post("/admin/changes/prune")
+def prune_change_feed():
+    """Delete change feed entries older than the retention window."""
+    deleted = fan_out(lambda db: prune_changes(db, settings.CHANGE_RETENTION_DAYS))
+    return {"deleted": sum(deleted)}
 
 
 @app.get("/requests/{request_id}", response_model=RequestStatus)
@@ -257,23 +583,17 @@ def get_request(request_id: int, db: Session = Depends(get_db)):
     )
 
 
-@app.post("/modules/{module_id}/submit", response_model=ModuleStatus)
-def submit_module(module_id: int, data: dict, db: Session = Depends(get_db)):
-    module = db.get(Module, module_id)
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
-    from .modules import registry
-
-    handler = registry.get(module.kind)
-    if not handler:
-        raise HTTPException(status_code=404, detail="Handler not found")
-
-    validated = handler.validate(data)
-    orchestrator: FileOrchestrator = app.state.orchestrator
-    
+def _apply_submission(
+    db: Session,
+    module: Module,
+    handler,
+    validated: dict,
+    orchestrator: FileOrchestrator,
+) -> None:
+    """Save validated data through the module handler and mark it complete."""
     # Save returns the data to store (may include file paths)
     result_data = handler.save(module.request, validated, orchestrator)
-    
+
     # Store the result data returned by handler
     module.result_data = result_data if result_data is not None else validated
     module.completed = True
@@ -288,15 +608,34 @@ def submit_module(module_id: int, data: dict, db: Session = Depends(get_db)):
         user_agent="Unknown"   # TODO: Get from request
     )
     db.add(access_log)
+    db.add(module)
+    if module.request is not None:
+        _bump_version(module.request)
+    record_change(db, "module_completed", module.request_id, module.id)
 
-    if module.request and all(m.completed for m in module.request.modules):
-        module.request.completed_at = datetime.utcnow()
-        db.add(module.request)
 
-    db.add(module)
-    db.commit()
-    db.refresh(module)
+def _check_completion(db: Session, req: ClientRequest | None) -> bool:
+    """Stamp ``completed_at`` when the last module is done; return whether it was.
+
+    Requests already completed are left alone, so resubmissions neither move
+    the timestamp nor record another completion.
+    """
+    if req and req.completed_at is None and all(m.completed for m in req.modules):
+        req.completed_at = datetime.utcnow()
+        db.add(req)
+        record_change(db, "request_completed", req.id)
+        return True
+    return False
+
+
+def _validation_errors(exc: ValueError) -> list:
+    """Return a JSON-serializable description of a handler validation error."""
+    if hasattr(exc, "json"):
+        return json.loads(exc.json())
+    return [{"msg": str(exc)}]
 
+
+def _module_status(module: Module) -> ModuleStatus:
     return ModuleStatus(
         id=module.id,
         kind=module.kind,
@@ -304,3 +643,91 @@ def submit_module(module_id: int, data: dict, db: Session = Depends(get_db)):
         completed=module.completed,
         completed_at=module.completed_at,
     )
+
+
+def _publish_submission(
+    req: ClientRequest, statuses: list[ModuleStatus], request_completed: bool
+) -> None:
+    for status in statuses:
+        broker.publish(req.id, "module_completed", jsonable_encoder(status))
+    if request_completed:
+        broker.publish(
+            req.id,
+            "request_completed",
+            jsonable_encoder({"id": req.id, "completed_at": req.completed_at}),
+        )
+    notify_changes()
+
+
+@app.post("/modules/{module_id}/submit", response_model=ModuleStatus)
+def submit_module(module_id: int, data: dict, db: Session = Depends(get_db)):
+    module = db.get(Module, module_id)
+    if not module:
+        raise HTTPException(status_code=404, detail="Module not found")
+    from .modules import registry
+
+    handler = registry.get(module.kind)
+    if not handler:
+        raise HTTPException(status_code=404, detail="Handler not found")
+
+    validated = handler.validate(data)
+    orchestrator: FileOrchestrator = app.state.orchestrator
+    _apply_submission(db, module, handler, validated, orchestrator)
+    request_completed = _check_completion(db, module.request)
+
+    db.commit()
+    db.refresh(module)
+
+    status = _module_status(module)
+    _publish_submission(module.request, [status], request_completed)
+    return status
+
+
+@app.post("/customer/{token}/submit", response_model=list[ModuleStatus])
+def submit_customer_modules(
+    token: str, data: BatchSubmit, db: Session = Depends(get_db)
+) -> list[ModuleStatus]:
+    """Validate and save several modules of a request in one transaction.
+
+    Every payload is validated before anything is saved; if any module
+    fails, all errors are returned together and nothing is applied.
+    """
+    req = db.query(ClientRequest).filter(ClientRequest.token == token).first()
+    if not req:
+        raise HTTPException(status_code=404, detail="Invalid token")
+    if req.expires_at and req.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=410, detail="Request has expired")
+    from .modules import registry
+
+    modules = {m.id: m for m in req.modules}
+    submissions = []
+    errors: dict[int, list] = {}
+    for module_id, payload in data.modules.items():
+        module = modules.get(module_id)
+        if module is None:
+            errors[module_id] = [{"msg": "Module not found"}]
+            continue
+        handler = registry.get(module.kind)
+        if not handler:
+            errors[module_id] = [{"msg": "Handler not found"}]
+            continue
+        try:
+            submissions.append((module, handler, handler.validate(payload)))
+        except ValueError as exc:
+            errors[module_id] = _validation_errors(exc)
+    if errors:
+        raise HTTPException(status_code=422, detail={"errors": errors})
+
+    orchestrator: FileOrchestrator = app.state.orchestrator
+    try:
+        for module, handler, validated in submissions:
+            _apply_submission(db, module, handler, validated, orchestrator)
+        request_completed = _check_completion(db, req)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    statuses = [_module_status(module) for module, _, _ in submissions]
+    _publish_submission(req, statuses, request_completed)
+    return statuses
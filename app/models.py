@@ -7,8 +7,10 @@ from datetime import datetime
 from sqlalchemy import (
     Boolean,
     Column,
+    Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     JSON,
     String,
@@ -35,6 +37,8 @@ class ClientRequest(Base):
     """Main request entity."""
 
     __tablename__ = "client_request"
+    # AUTOINCREMENT lets each shard allocate IDs from its own range.
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True)
     token = Column(String(64), unique=True, nullable=False, index=True)
@@ -45,6 +49,8 @@ class ClientRequest(Base):
     completed_at = Column(DateTime)
     last_accessed = Column(DateTime)
     meta = Column(JSON, default=dict)
+    # Bumped whenever the customer-facing payload (modules, completion) changes.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     creator = relationship("User", back_populates="requests")
     modules = relationship(
@@ -59,12 +65,14 @@ class Module(Base):
     """Generic module instance."""
 
     __tablename__ = "module"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True)
     request_id = Column(
         Integer,
         ForeignKey("client_request.id"),
         nullable=False,
+        index=True,
     )
     kind = Column(String(50), nullable=False)
     label = Column(String(255))
@@ -91,6 +99,12 @@ class AccessLog(Base):
     """Security and analytics logging."""
 
     __tablename__ = "access_log"
+    __table_args__ = (
+        Index("ix_access_log_request_id_timestamp", "request_id", "timestamp"),
+        Index("ix_access_log_module_id", "module_id"),
+        Index("ix_access_log_timestamp", "timestamp"),
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True)
     request_id = Column(Integer, ForeignKey("client_request.id"))
@@ -102,3 +116,38 @@ class AccessLog(Base):
 
     request = relationship("ClientRequest", back_populates="access_logs")
     module = relationship("Module", back_populates="access_logs")
+
+
+class AccessLogDaily(Base):
+    """Daily access counts per request and action rolled up from ``access_log``."""
+
+    __tablename__ = "access_log_daily"
+    __table_args__ = (Index("ix_access_log_daily_day_action", "day", "action"),)
+
+    request_id = Column(Integer, ForeignKey("client_request.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    action = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class RollupState(Base):
+    """Highest raw row ID already folded into a rollup table."""
+
+    __tablename__ = "rollup_state"
+
+    name = Column(String(64), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+
+
+class ChangeLog(Base):
+    """Monotonic change sequence consumed by incremental sync clients."""
+
+    __tablename__ = "change_log"
+    # AUTOINCREMENT keeps sequence numbers from being reused after pruning.
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    request_id = Column(Integer, ForeignKey("client_request.id"), nullable=False)
+    module_id = Column(Integer, ForeignKey("module.id"), nullable=True)
+    action = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -18,6 +18,10 @@ class ModuleHandler:
 
     key: str
     name: str
+    # ``result_data`` fields stored encrypted with ``ENCRYPTION_KEY``.
+    sensitive_fields: tuple[str, ...] = ()
+    # ``result_data`` fields holding paths relative to the upload folder.
+    file_fields: tuple[str, ...] = ()
 
     def get_fields(self) -> list[BaseModel]:
         raise NotImplementedError
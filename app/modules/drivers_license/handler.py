@@ -28,6 +28,7 @@ class DriversLicenseModel(BaseModel):
 class DriversLicenseModuleHandler(ModuleHandler):
     key = "drivers_license"
     name = "Driver's License"
+    file_fields = ("front_image", "back_image")
     
     def get_fields(self) -> list[dict]:
         """Return field configuration for form rendering."""
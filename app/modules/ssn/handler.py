@@ -4,7 +4,7 @@ from pydantic import BaseModel, Field
 
 from ...models import ClientRequest
 from .. import ModuleHandler
-from ...settings import Settings
+from ...settings import get_settings
 from ...utils import encryption
 from ...utils.file_orchestrator import FileOrchestrator
 
@@ -20,6 +20,7 @@ class SSNModel(BaseModel):
 class SSNModuleHandler(ModuleHandler):
     key = "ssn"
     name = "Social Security Number"
+    sensitive_fields = ("ssn",)
 
     def get_fields(self) -> list[BaseModel]:
         return [SSNModel]
@@ -33,7 +34,7 @@ class SSNModuleHandler(ModuleHandler):
         data: dict,
         orchestrator: FileOrchestrator,
     ) -> None:
-        key = Settings().ENCRYPTION_KEY.encode()
+        key = get_settings().ENCRYPTION_KEY.encode()
         encrypted = encryption.encrypt(data["ssn"], key)
         data["ssn"] = encrypted.decode()
 
@@ -1,4 +1,5 @@
 from app.modules import discover_modules, registry
+from app.settings import get_settings
 from app.utils import encryption
 from app.utils.file_orchestrator import FileOrchestrator
 
@@ -10,7 +11,7 @@ def test_ssn_module_registered():
 
 def test_ssn_save_encrypted(monkeypatch):
     key = encryption.generate_key()
-    monkeypatch.setenv("ENCRYPTION_KEY", key.decode())
+    monkeypatch.setattr(get_settings(), "ENCRYPTION_KEY", key.decode())
     discover_modules()
     handler = registry["ssn"]
 
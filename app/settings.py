@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Set
+import threading
+from typing import Callable, Optional, Set
 
 from pydantic_settings import BaseSettings
 
@@ -12,6 +13,9 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "insecure-development-key"
     ENCRYPTION_KEY: str = "insecure-development-encryption-key"
     DATABASE_URL: str = "sqlite:///./filemaster.db"
+    DB_POOL_SIZE: Optional[int] = None  # engine default when unset
+    DB_MAX_OVERFLOW: Optional[int] = None
+    SHARD_COUNT: int = 1  # DATABASE_URL needs a {shard} placeholder when > 1
 
     # File handling
     UPLOAD_FOLDER: str = "uploads"  # base directory for FileOrchestrator
@@ -20,6 +24,7 @@ class Settings(BaseSettings):
 
     # Security
     SESSION_TIMEOUT: int = 7200  # 2 hours
+    LAST_ACCESSED_FLUSH_SECONDS: int = 60  # coalescing window for last_accessed
     TOKEN_EXPIRY_DAYS: int = 7
     CLEANUP_GRACE_HOURS: int = 48
 
@@ -31,6 +36,85 @@ class Settings(BaseSettings):
     MAX_MODULES_PER_REQUEST: int = 20
     DEFAULT_REQUEST_EXPIRY_DAYS: int = 7
 
+    # Live events
+    SSE_HEARTBEAT_SECONDS: int = 15
+    SSE_BUFFER_SIZE: int = 100  # events buffered per subscriber
+
+    # Bulk export
+    EXPORT_BATCH_SIZE: int = 1000  # rows fetched per cursor batch
+    EXPORT_DECRYPT_WORKERS: int = 4
+    EXPORT_DECRYPT_SENSITIVE: bool = False  # include plaintext sensitive fields
+    EXPORT_INCLUDE_TOKENS: bool = False  # tokens grant customer portal access
+
+    # Change feed
+    CHANGE_RETENTION_DAYS: int = 30
+    CHANGE_FEED_MAX_WAIT: int = 30  # longest allowed long-poll in seconds
+
+    # Access log analytics
+    ACCESS_LOG_RETENTION_DAYS: int = 90
+    ACCESS_LOG_BATCH_SIZE: int = 5000  # rows rolled up or pruned per transaction
+
+    # Admission control; a limit of 0 disables the route class's limiter
+    ADMISSION_UPLOAD_LIMIT: int = 4  # concurrent uploads per worker
+    ADMISSION_SUBMIT_LIMIT: int = 16
+    ADMISSION_READ_LIMIT: int = 64
+    ADMISSION_QUEUE_SIZE: int = 16  # requests waiting per route class
+    ADMISSION_QUEUE_TIMEOUT: float = 5.0  # seconds before a queued request is shed
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
+
+
+SettingsSubscriber = Callable[[Settings, Set[str]], None]
+
+_settings: Settings | None = None
+_subscribers: list[SettingsSubscriber] = []
+_lock = threading.Lock()
+
+
+def get_settings() -> Settings:
+    """Return the process-wide settings, loading them on first use."""
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                _settings = Settings()
+    return _settings
+
+
+def subscribe(callback: SettingsSubscriber) -> SettingsSubscriber:
+    """Call ``callback(settings, changed)`` after each reload that changes values.
+
+    Returns the callback so it can be used as a decorator.
+    """
+    _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback: SettingsSubscriber) -> None:
+    """Stop notifying ``callback`` of reloads."""
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def reload_settings() -> Set[str]:
+    """Re-read the environment and ``.env`` into the cached settings in place.
+
+    Objects holding a reference to the settings see the new values. Returns
+    the names of the fields that changed.
+    """
+    fresh = Settings()
+    current = get_settings()
+    with _lock:
+        changed = {
+            name
+            for name in type(fresh).model_fields
+            if getattr(fresh, name) != getattr(current, name)
+        }
+        for name in changed:
+            setattr(current, name, getattr(fresh, name))
+    if changed:
+        for callback in list(_subscribers):
+            callback(current, changed)
+    return changed
@@ -0,0 +1,97 @@
+"""Coalesced ``last_accessed`` and view logging for client requests."""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.orm import Session
+
+from ..models import AccessLog, ClientRequest
+from .database import shard_for_id
+
+
+class LastAccessedBuffer:
+    """Buffer request access times in memory and write them in batches.
+
+    Repeated touches of a request between flushes collapse into one
+    pending timestamp, so each request row is written at most once per
+    flush interval regardless of how often it is polled. Portal views are
+    buffered too and written to ``access_log`` in the same transaction,
+    so a poll does not need a write transaction of its own.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[int, datetime] = {}
+        self._views: List[Tuple[int, datetime]] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def touch(self, request_id: int, when: datetime | None = None) -> None:
+        """Record an access to ``request_id``."""
+        with self._lock:
+            self._pending[request_id] = when or datetime.utcnow()
+
+    def record_view(self, request_id: int, when: datetime | None = None) -> None:
+        """Record a portal view of ``request_id``, which also counts as an access."""
+        when = when or datetime.utcnow()
+        with self._lock:
+            self._pending[request_id] = when
+            self._views.append((request_id, when))
+
+    def drain(self) -> Tuple[Dict[int, datetime], List[Tuple[int, datetime]]]:
+        """Remove and return all pending access times and views."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            views, self._views = self._views, []
+            self._last_flush = time.monotonic()
+        return pending, views
+
+    def flush(self, db: Session, interval: float = 0) -> int:
+        """Write pending access times and views if ``interval`` seconds have passed.
+
+        Returns the number of requests updated.
+        """
+        with self._lock:
+            if not self._pending or time.monotonic() - self._last_flush < interval:
+                return 0
+        pending, views = self.drain()
+        if not pending:
+            return 0
+        table = ClientRequest.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("rid"))
+            .values(last_accessed=bindparam("ts"))
+        )
+        by_shard: Dict[int, list] = {}
+        for rid, ts in pending.items():
+            by_shard.setdefault(shard_for_id(rid), []).append({"rid": rid, "ts": ts})
+        for shard, params in by_shard.items():
+            db.execute(stmt, params, bind_arguments={"shard_id": str(shard)})
+
+        views_by_shard: Dict[int, list] = {}
+        for rid, ts in views:
+            views_by_shard.setdefault(shard_for_id(rid), []).append(
+                {
+                    "request_id": rid,
+                    "action": "view",
+                    "timestamp": ts,
+                    "ip_address": "0.0.0.0",  # TODO: Get real IP
+                    "user_agent": "Unknown",  # TODO: Get from request
+                }
+            )
+        for shard, rows in views_by_shard.items():
+            db.execute(
+                insert(AccessLog.__table__),
+                rows,
+                bind_arguments={"shard_id": str(shard)},
+            )
+        db.commit()
+        return len(pending)
+
+
+last_accessed = LastAccessedBuffer()
@@ -0,0 +1,234 @@
+"""Admission control for expensive routes.
+
+Requests are sorted into route classes (uploads, submits and reads), and
+each class has its own concurrency limit and a short bounded wait queue.
+When the queue is full, or a queued request waits longer than the
+timeout, the request is rejected with ``503`` and a ``Retry-After`` header
+estimated from the class's observed service time. Uploads estimate their
+service time from ``MAX_FILE_SIZE`` and the observed upload throughput.
+
+The limits are per worker process. All state is touched only from the
+worker's event loop, so no locking is needed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import re
+import time
+from collections import deque
+from typing import Any, Dict
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..settings import Settings
+
+# Submissions with bodies at least this large are treated as uploads.
+UPLOAD_MIN_BYTES = 64 * 1024
+MAX_RETRY_AFTER = 120
+# Weight of the newest sample in the moving averages.
+_SMOOTHING = 0.2
+
+_SUBMIT_PATH = re.compile(r"^/(modules/\d+|customer/[^/]+)/submit$")
+_READ_PATH = re.compile(r"^/customer/[^/]+$")
+
+
+def _average(current: float | None, sample: float) -> float:
+    if current is None:
+        return sample
+    return current + _SMOOTHING * (sample - current)
+
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded FIFO wait queue for one route class.
+
+    A ``limit`` of ``0`` disables the limiter.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        queue_size: int,
+        timeout: float,
+        expected_bytes: int | None = None,
+    ) -> None:
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        # Request size assumed when estimating service time from throughput.
+        self.expected_bytes = expected_bytes
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.avg_seconds: float | None = None
+        self.bytes_per_second: float | None = None
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; returns ``False`` if the request should be shed."""
+        if self.limit <= 0 or (self.active < self.limit and not self.queued):
+            self.active += 1
+            self.admitted += 1
+            return True
+        if self.queued >= self.queue_size:
+            self.rejected += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as we gave up; pass it on.
+                self._release_slot()
+            else:
+                self._discard(waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                self.timed_out += 1
+                return False
+            raise
+        # The releasing request transferred its slot to us.
+        self.admitted += 1
+        return True
+
+    def release(self, seconds: float, received: int = 0) -> None:
+        """Free a slot and record how long the request took."""
+        self.avg_seconds = _average(self.avg_seconds, seconds)
+        if received and seconds > 0:
+            self.bytes_per_second = _average(self.bytes_per_second, received / seconds)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active = max(self.active - 1, 0)
+
+    def _discard(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def service_seconds(self) -> float:
+        """Estimate how long one request of this class holds a slot."""
+        if self.expected_bytes and self.bytes_per_second:
+            return self.expected_bytes / self.bytes_per_second
+        return self.avg_seconds or 1.0
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request should have drained."""
+        backlog = self.queued + 1
+        estimate = backlog * self.service_seconds() / max(self.limit, 1)
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(estimate)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_seconds": self.avg_seconds,
+            "bytes_per_second": self.bytes_per_second,
+            "retry_after": self.retry_after(),
+        }
+
+
+class AdmissionController:
+    """Route classifier holding one limiter per route class."""
+
+    def __init__(self) -> None:
+        self.limiters: Dict[str, AdmissionLimiter] = {
+            name: AdmissionLimiter(name, 0, 0, 0)
+            for name in ("uploads", "submits", "reads")
+        }
+
+    def configure(self, settings: Settings) -> None:
+        """Apply limits from ``settings``; counters and averages are kept."""
+        limits = {
+            "uploads": settings.ADMISSION_UPLOAD_LIMIT,
+            "submits": settings.ADMISSION_SUBMIT_LIMIT,
+            "reads": settings.ADMISSION_READ_LIMIT,
+        }
+        for name, limiter in self.limiters.items():
+            limiter.limit = limits[name]
+            limiter.queue_size = settings.ADMISSION_QUEUE_SIZE
+            limiter.timeout = settings.ADMISSION_QUEUE_TIMEOUT
+        self.limiters["uploads"].expected_bytes = settings.MAX_FILE_SIZE
+
+    def classify(self, scope: Scope) -> AdmissionLimiter | None:
+        """Return the limiter for a request, or ``None`` if it is unlimited."""
+        method, path = scope["method"], scope["path"]
+        if method == "POST":
+            headers = dict(scope["headers"])
+            content_type = headers.get(b"content-type", b"")
+            try:
+                length = int(headers.get(b"content-length", b"0"))
+            except ValueError:
+                length = 0
+            if content_type.startswith(b"multipart/form-data") or (
+                _SUBMIT_PATH.match(path) and length >= UPLOAD_MIN_BYTES
+            ):
+                return self.limiters["uploads"]
+            if _SUBMIT_PATH.match(path):
+                return self.limiters["submits"]
+        elif method == "GET" and _READ_PATH.match(path):
+            return self.limiters["reads"]
+        return None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+class AdmissionMiddleware:
+    """ASGI middleware enforcing an :class:`AdmissionController`."""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController) -> None:
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self.controller.classify(scope) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        if not await limiter.acquire():
+            response = JSONResponse(
+                {"detail": "Server busy, please retry"},
+                status_code=503,
+                headers={"Retry-After": str(limiter.retry_after())},
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, counting_receive, send)
+        finally:
+            limiter.release(time.monotonic() - start, received)
+
+
+admission = AdmissionController()
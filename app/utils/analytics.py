@@ -0,0 +1,141 @@
+"""Access log rollups, retention and analytics queries."""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..models import AccessLog, AccessLogDaily, RollupState
+
+ROLLUP_NAME = "access_log_daily"
+
+
+def _insert(db: Session):
+    """Return the dialect's ``INSERT`` construct, which supports upserts."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def rollup_access_logs(db: Session, batch_size: int = 5000) -> int:
+    """Fold raw access log rows added since the last run into daily counts.
+
+    Work is committed in ID ranges of ``batch_size`` together with the
+    watermark, so an interrupted run resumes where it stopped. Each batch
+    claims its range by advancing the watermark with a compare-and-set
+    before adding the counts, so runs in several processes never fold the
+    same rows twice; a run that loses the race stops. Returns the number
+    of raw rows processed.
+    """
+    insert = _insert(db)
+    db.execute(
+        insert(RollupState)
+        .values(name=ROLLUP_NAME, last_id=0)
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    db.commit()
+    processed = 0
+    while True:
+        last_id = db.scalar(
+            select(RollupState.last_id).where(RollupState.name == ROLLUP_NAME)
+        )
+        # Skip gaps, such as the IDs below a shard's range, in one step.
+        lower = db.scalar(select(func.min(AccessLog.id)).where(AccessLog.id > last_id))
+        max_id = db.scalar(select(func.max(AccessLog.id)))
+        # End the read so the claim below starts a write transaction.
+        db.commit()
+        if lower is None:
+            break
+        upper = min(lower - 1 + batch_size, max_id)
+        claimed = db.execute(
+            update(RollupState)
+            .where(RollupState.name == ROLLUP_NAME, RollupState.last_id == last_id)
+            .values(last_id=upper)
+        )
+        if claimed.rowcount == 0:
+            # Another run advanced the watermark; it owns the remaining rows.
+            db.rollback()
+            break
+        in_range = (
+            AccessLog.id > last_id,
+            AccessLog.id <= upper,
+            AccessLog.request_id.is_not(None),
+        )
+        day = func.date(AccessLog.timestamp)
+        action = func.coalesce(AccessLog.action, "unknown")
+        counts = (
+            select(AccessLog.request_id, day, action, func.count())
+            .where(*in_range)
+            .group_by(AccessLog.request_id, day, action)
+        )
+        stmt = insert(AccessLogDaily).from_select(
+            ["request_id", "day", "action", "count"], counts
+        )
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["request_id", "day", "action"],
+                set_={"count": AccessLogDaily.count + stmt.excluded["count"]},
+            )
+        )
+        processed += db.scalar(select(func.count(AccessLog.id)).where(*in_range))
+        db.commit()
+    return processed
+
+
+def prune_access_logs(
+    db: Session, retention_days: int, batch_size: int = 5000
+) -> int:
+    """Delete rolled-up raw rows older than the retention window in batches.
+
+    Rows not yet folded into the rollups are kept regardless of age.
+    Returns the number of rows deleted.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    state = db.get(RollupState, ROLLUP_NAME)
+    watermark = state.last_id if state else 0
+    deleted = 0
+    while True:
+        ids = list(
+            db.scalars(
+                select(AccessLog.id)
+                .where(AccessLog.id <= watermark, AccessLog.timestamp < cutoff)
+                .order_by(AccessLog.id)
+                .limit(batch_size)
+            )
+        )
+        if not ids:
+            break
+        db.execute(delete(AccessLog).where(AccessLog.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
+    return deleted
+
+
+def request_activity(db: Session, request_id: int) -> list[dict]:
+    """Return daily action counts for a single request."""
+    stmt = (
+        select(AccessLogDaily.day, AccessLogDaily.action, AccessLogDaily.count)
+        .where(AccessLogDaily.request_id == request_id)
+        .order_by(AccessLogDaily.day, AccessLogDaily.action)
+    )
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+def daily_activity(
+    db: Session, since: date | None = None, until: date | None = None
+) -> list[dict]:
+    """Return action counts per day summed across all requests."""
+    total = func.sum(AccessLogDaily.count).label("count")
+    stmt = (
+        select(AccessLogDaily.day, AccessLogDaily.action, total)
+        .group_by(AccessLogDaily.day, AccessLogDaily.action)
+        .order_by(AccessLogDaily.day, AccessLogDaily.action)
+    )
+    if since is not None:
+        stmt = stmt.where(AccessLogDaily.day >= since)
+    if until is not None:
+        stmt = stmt.where(AccessLogDaily.day <= until)
+    return [dict(row) for row in db.execute(stmt).mappings()]
@@ -0,0 +1,58 @@
+"""Incremental change feed backed by the ``change_log`` table."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from ..models import ChangeLog
+from .events import broker
+
+# Broker key used to wake long-polling change feed consumers.
+CHANGES_TOPIC = "changes"
+
+
+def record_change(
+    db: Session, action: str, request_id: int, module_id: int | None = None
+) -> ChangeLog:
+    """Add a change entry to the session's current transaction."""
+    change = ChangeLog(action=action, request_id=request_id, module_id=module_id)
+    db.add(change)
+    return change
+
+
+def notify_changes() -> None:
+    """Wake waiting consumers; call after the recording transaction commits."""
+    broker.publish(CHANGES_TOPIC, "changes")
+
+
+def fetch_changes(db: Session, after: int, limit: int) -> list[dict]:
+    """Return up to ``limit`` changes with a sequence greater than ``after``."""
+    stmt = (
+        select(
+            ChangeLog.seq,
+            ChangeLog.action,
+            ChangeLog.request_id,
+            ChangeLog.module_id,
+            ChangeLog.created_at,
+        )
+        .where(ChangeLog.seq > after)
+        .order_by(ChangeLog.seq)
+        .limit(limit)
+    )
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+def oldest_sequence(db: Session) -> int | None:
+    """Return the oldest retained sequence number, if any."""
+    return db.scalar(select(func.min(ChangeLog.seq)))
+
+
+def prune_changes(db: Session, retention_days: int) -> int:
+    """Delete changes older than the retention window and commit."""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    result = db.execute(delete(ChangeLog).where(ChangeLog.created_at < cutoff))
+    db.commit()
+    return result.rowcount
@@ -2,11 +2,17 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator
 
+from cryptography.fernet import InvalidToken
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from ..models import Module
+from ..models import ClientRequest, Module
+from . import encryption
 
 
 def get_module_data(db: Session, module_id: int) -> Dict[str, Any] | None:
@@ -24,3 +30,97 @@ def get_request_data(db: Session, request_id: int) -> Dict[int, Dict[str, Any]]:
         .all()
     )
     return {mod.id: mod.result_data for mod in modules}
+
+
+def iter_module_results(
+    db: Session,
+    since: datetime | None = None,
+    kinds: Iterable[str] | None = None,
+    batch_size: int = 1000,
+    include_token: bool = False,
+) -> Iterator[list[Dict[str, Any]]]:
+    """Yield completed module results across requests in batches.
+
+    Rows are read through a streaming cursor so only one batch is held in
+    memory at a time. The request token grants access to the customer
+    portal, so it is only included when ``include_token`` is set.
+    """
+    columns = [
+        Module.id,
+        Module.request_id,
+        Module.kind,
+        Module.label,
+        Module.completed_at,
+        Module.result_data,
+    ]
+    stmt = select(*columns)
+    if include_token:
+        stmt = select(*columns, ClientRequest.token).join(
+            ClientRequest, Module.request_id == ClientRequest.id
+        )
+    stmt = (
+        stmt.where(Module.completed.is_(True))
+        .order_by(Module.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if since is not None:
+        stmt = stmt.where(Module.completed_at >= since)
+    if kinds:
+        stmt = stmt.where(Module.kind.in_(list(kinds)))
+    for partition in db.execute(stmt).partitions():
+        yield [row._asdict() for row in partition]
+
+
+def decrypt_fields(
+    data: Dict[str, Any] | None, fields: Iterable[str], key: bytes
+) -> Dict[str, Any] | None:
+    """Return a copy of ``data`` with the given encrypted fields decrypted.
+
+    Values that cannot be decrypted with ``key`` are replaced by ``None``.
+    """
+    if not data:
+        return data
+    result = dict(data)
+    for field in fields:
+        value = result.get(field)
+        if not value:
+            continue
+        try:
+            result[field] = encryption.decrypt(value.encode(), key)
+        except (InvalidToken, ValueError):
+            result[field] = None
+    return result
+
+
+def export_ndjson(
+    db: Session,
+    key: bytes | None,
+    since: datetime | None = None,
+    kinds: Iterable[str] | None = None,
+    batch_size: int = 1000,
+    workers: int = 4,
+    include_token: bool = False,
+) -> Iterator[str]:
+    """Yield module results as newline-delimited JSON, one chunk per batch.
+
+    Sensitive fields declared by each module handler are decrypted in a
+    bounded thread pool, or left out of the records when ``key`` is ``None``.
+    Request tokens are only exported with ``include_token``.
+    """
+    from ..modules import registry
+
+    def encode(record: Dict[str, Any]) -> str:
+        handler = registry.get(record["kind"])
+        fields = getattr(handler, "sensitive_fields", ())
+        data = record["result_data"]
+        if fields and data and key is None:
+            record["result_data"] = {k: v for k, v in data.items() if k not in fields}
+        elif fields:
+            record["result_data"] = decrypt_fields(data, fields, key)
+        if record["completed_at"] is not None:
+            record["completed_at"] = record["completed_at"].isoformat()
+        return json.dumps(record, default=str)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in iter_module_results(db, since, kinds, batch_size, include_token):
+            yield "\n".join(executor.map(encode, batch)) + "\n"
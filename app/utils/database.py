@@ -1,20 +1,303 @@
-"""Database configuration utilities."""
+"""Database configuration utilities.
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+Requests can be spread across ``SHARD_COUNT`` database files. A request
+and all of its rows live on one shard, chosen by the first byte of its
+token. Row IDs on shard ``k`` are allocated from ``k * SHARD_ID_SPAN``,
+so any ID also identifies its shard. With a single shard, sessions are
+plain sessions bound to one engine.
+"""
 
-from ..models import Base
-from ..settings import Settings
+from __future__ import annotations
 
-engine = create_engine(Settings().DATABASE_URL, future=True)
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine,
-    future=True,
-)
+import os
+from concurrent.futures import ThreadPoolExecutor
+from secrets import randbelow, token_hex
+from typing import Callable, Set, TypeVar
 
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import visitors
 
-def init_db() -> None:
-    """Initialize database tables."""
-    Base.metadata.create_all(bind=engine)
+from ..models import Base, ClientRequest
+from ..settings import Settings, get_settings, subscribe
+
+T = TypeVar("T")
+
+ENGINE_SETTINGS = {"DATABASE_URL", "DB_POOL_SIZE", "DB_MAX_OVERFLOW"}
+SHARD_PLACEHOLDER = "{shard}"
+# Width of the ID range reserved for each shard.
+SHARD_ID_SPAN = 1 << 40
+MAX_SHARDS = 256
+
+
+def shard_urls(settings: Settings) -> list[str]:
+    """Return the database URL of every shard."""
+    url = settings.DATABASE_URL
+    count = settings.SHARD_COUNT
+    if not 1 <= count <= MAX_SHARDS:
+        # Tokens are routed by their first byte, so at most 256 shards.
+        raise ValueError(f"SHARD_COUNT must be between 1 and {MAX_SHARDS}")
+    if count == 1:
+        return [url.replace(SHARD_PLACEHOLDER, "0")]
+    if make_url(url.replace(SHARD_PLACEHOLDER, "0")).get_backend_name() != "sqlite":
+        # ID ranges are seeded through sqlite_sequence.
+        raise ValueError("SHARD_COUNT > 1 is only supported with SQLite databases")
+    if SHARD_PLACEHOLDER not in url:
+        raise ValueError(
+            f"DATABASE_URL must contain {SHARD_PLACEHOLDER} when SHARD_COUNT > 1"
+        )
+    return [url.replace(SHARD_PLACEHOLDER, str(i)) for i in range(count)]
+
+
+def _create_engine(settings: Settings, url: str) -> Engine:
+    options = {}
+    if settings.DB_POOL_SIZE is not None:
+        options["pool_size"] = settings.DB_POOL_SIZE
+    if settings.DB_MAX_OVERFLOW is not None:
+        options["max_overflow"] = settings.DB_MAX_OVERFLOW
+    return create_engine(url, future=True, **options)
+
+
+def shard_for_token(token: str, count: int) -> int:
+    """Return the shard owning the request with ``token``."""
+    try:
+        return int(token[:2], 16) % count
+    except ValueError:
+        return 0
+
+
+def shard_for_id(row_id: int) -> int:
+    """Return the shard whose ID range contains ``row_id``."""
+    return row_id // SHARD_ID_SPAN
+
+
+def new_token(count: int, shard: int | None = None) -> str:
+    """Generate a request token routed to ``shard`` (random if omitted)."""
+    if shard is None:
+        shard = randbelow(count)
+    # Any first byte congruent to the shard routes there; keep it random.
+    prefix = shard + count * randbelow(256 // count)
+    return f"{prefix:02x}{token_hex(15)}"
+
+
+def _instance_shard(instance, count: int) -> int:
+    if isinstance(instance, ClientRequest):
+        return shard_for_token(instance.token, count)
+    request_id = getattr(instance, "request_id", None)
+    if request_id is not None:
+        return shard_for_id(request_id)
+    request = getattr(instance, "request", None)
+    if request is not None:
+        if request.id is not None:
+            return shard_for_id(request.id)
+        return shard_for_token(request.token, count)
+    return 0
+
+
+def _id_range_tables() -> list:
+    return [
+        table
+        for table in Base.metadata.sorted_tables
+        if table.dialect_options["sqlite"]["autoincrement"]
+    ]
+
+
+def _criteria_shards(statement, count: int) -> set[int]:
+    """Collect shards implied by ``column == value`` comparisons on routing keys.
+
+    Only equality on a request token, a request ID or a sharded row ID is
+    used; statements without one run on every shard.
+    """
+    shards: set[int] = set()
+    id_tables = set(_id_range_tables())
+
+    def visit_binary(binary) -> None:
+        if binary.operator.__name__ != "eq":
+            return
+        for column, value in (
+            (binary.left, binary.right),
+            (binary.right, binary.left),
+        ):
+            if getattr(value, "__visit_name__", None) != "bindparam":
+                continue
+            value = value.effective_value
+            table = getattr(column, "table", None)
+            name = getattr(column, "name", None)
+            if table is ClientRequest.__table__ and name == "token":
+                if isinstance(value, str):
+                    shards.add(shard_for_token(value, count))
+            elif name == "request_id" or (name == "id" and table in id_tables):
+                if isinstance(value, int):
+                    shards.add(shard_for_id(value))
+
+    whereclause = getattr(statement, "whereclause", None)
+    if whereclause is not None:
+        visitors.traverse(whereclause, {}, {"binary": visit_binary})
+    return {shard for shard in shards if shard < count}
+
+
+def _sharded_options(engines: list[Engine]) -> dict:
+    count = len(engines)
+    all_shards = [str(i) for i in range(count)]
+
+    def shard_chooser(mapper, instance, clause=None):
+        if instance is None:
+            return "0"
+        return str(_instance_shard(instance, count))
+
+    def identity_chooser(mapper, primary_key, *, lazy_loaded_from, **kw):
+        if lazy_loaded_from is not None:
+            return [lazy_loaded_from.identity_token]
+        if isinstance(primary_key[0], int):
+            shard = shard_for_id(primary_key[0])
+            return [str(shard)] if shard < count else []
+        return all_shards
+
+    def execute_chooser(context):
+        if context.is_select and context.lazy_loaded_from is not None:
+            return [context.lazy_loaded_from.identity_token]
+        shards = _criteria_shards(context.statement, count)
+        return [str(shard) for shard in sorted(shards)] or all_shards
+
+    return {
+        "class_": ShardedSession,
+        "shards": {str(i): engine for i, engine in enumerate(engines)},
+        "shard_chooser": shard_chooser,
+        "identity_chooser": identity_chooser,
+        "execute_chooser": execute_chooser,
+    }
+
+
+def make_sessionmaker(engines: list[Engine]) -> sessionmaker:
+    """Build a session factory that routes across ``engines``."""
+    if len(engines) == 1:
+        return sessionmaker(
+            autocommit=False, autoflush=False, bind=engines[0], future=True
+        )
+    return sessionmaker(
+        autocommit=False, autoflush=False, future=True, **_sharded_options(engines)
+    )
+
+
+_settings = get_settings()
+# Changing the shard count reroutes every token, so it is fixed per process.
+shard_count = _settings.SHARD_COUNT
+engines = [_create_engine(_settings, url) for url in shard_urls(_settings)]
+engine = engines[0]
+SessionLocal = make_sessionmaker(engines)
+# Plain per-shard session factories for work that targets one shard.
+shard_sessions = [make_sessionmaker([e]) for e in engines]
+
+
+@subscribe
+def _reconfigure_engine(settings: Settings, changed: Set[str]) -> None:
+    """Swap in new engines when connection settings are reloaded."""
+    global engine
+    if not changed & ENGINE_SETTINGS:
+        return
+    previous = list(engines)
+    urls = shard_urls(settings.model_copy(update={"SHARD_COUNT": shard_count}))
+    engines[:] = [_create_engine(settings, url) for url in urls]
+    engine = engines[0]
+    if shard_count == 1:
+        SessionLocal.configure(bind=engine)
+    else:
+        SessionLocal.configure(shards=_sharded_options(engines)["shards"])
+    for maker, new_engine in zip(shard_sessions, engines):
+        maker.configure(bind=new_engine)
+    # Checked-out connections finish their work and are closed on return.
+    for old in previous:
+        old.dispose()
+
+
+def _dispose_after_fork() -> None:
+    """Drop pooled connections inherited from the parent process.
+
+    ``close=False`` leaves the parent's sockets and file handles alone;
+    the child opens its own connections on first use.
+    """
+    for child_engine in engines:
+        child_engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_after_fork)
+
+
+def fan_out(fn: Callable[[Session], T]) -> list[T]:
+    """Run ``fn`` with a session on every shard in parallel.
+
+    Results are returned in shard order.
+    """
+
+    def run(maker: sessionmaker) -> T:
+        with maker() as db:
+            return fn(db)
+
+    if len(shard_sessions) == 1:
+        return [run(shard_sessions[0])]
+    with ThreadPoolExecutor(max_workers=len(shard_sessions)) as pool:
+        return list(pool.map(run, shard_sessions))
+
+
+def _add_missing_columns(bind: Engine) -> None:
+    """Add model columns absent from tables created by older versions."""
+    inspector = inspect(bind)
+    preparer = bind.dialect.identifier_preparer
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = (
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} "
+                    f"{column.type.compile(dialect=bind.dialect)}"
+                )
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+                conn.execute(text(ddl))
+
+
+def _seed_id_range(bind: Engine, shard: int) -> None:
+    """Start AUTOINCREMENT tables on ``bind`` at the shard's ID range."""
+    if shard == 0 or bind.dialect.name != "sqlite":
+        return
+    with bind.begin() as conn:
+        has_sequence = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'")
+        ).first()
+        if not has_sequence:
+            # Tables created before AUTOINCREMENT was enabled; nothing to seed.
+            return
+        for name in (table.name for table in _id_range_tables()):
+            conn.execute(
+                text(
+                    "INSERT INTO sqlite_sequence (name, seq) SELECT :name, :seq "
+                    "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"
+                ),
+                {"name": name, "seq": shard * SHARD_ID_SPAN},
+            )
+
+
+def init_db(targets: list[Engine] | None = None) -> None:
+    """Initialize database tables on every shard."""
+    from .search import ensure_search_index, search_supported
+
+    for shard, bind in enumerate(targets if targets is not None else engines):
+        _add_missing_columns(bind)
+        Base.metadata.create_all(bind=bind)
+        # create_all skips tables that already exist, including their indexes.
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=bind, checkfirst=True)
+        _seed_id_range(bind, shard)
+        if search_supported(bind):
+            ensure_search_index(bind)
@@ -0,0 +1,106 @@
+"""In-process publish/subscribe broker for live request events."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, Dict, Hashable, Set
+
+
+class Subscription:
+    """A subscriber's bounded event buffer bound to its event loop."""
+
+    def __init__(
+        self, key: Hashable, loop: asyncio.AbstractEventLoop, maxsize: int
+    ) -> None:
+        self.key = key
+        self.loop = loop
+        self.dropped = 0
+        self._events: deque[dict] = deque(maxlen=maxsize)
+        self._ready = asyncio.Event()
+
+    def _push(self, message: dict) -> None:
+        # Runs on the subscriber's loop; the oldest event is discarded when full.
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append(message)
+        self._ready.set()
+
+    async def get(self, timeout: float) -> list[dict] | None:
+        """Return all buffered events, or ``None`` if none arrive in time."""
+        if not self._events:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        events = list(self._events)
+        self._events.clear()
+        self._ready.clear()
+        return events
+
+
+class EventBroker:
+    """Fan out published events to the subscribers of a key.
+
+    ``publish`` is thread-safe so synchronous endpoints running in the
+    threadpool can notify subscribers waiting on the event loop.
+    """
+
+    def __init__(self, maxsize: int = 100) -> None:
+        self.maxsize = maxsize
+        self._subscribers: Dict[Hashable, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key: Hashable) -> Subscription:
+        """Register a subscriber on the running loop for ``key``."""
+        subscription = Subscription(key, asyncio.get_running_loop(), self.maxsize)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscriber; unknown subscribers are ignored."""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.key]
+
+    def publish(self, key: Hashable, event: str, data: Any = None) -> int:
+        """Deliver an event to every subscriber of ``key``.
+
+        Returns the number of subscribers the event was queued for.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        message = {"event": event, "data": data}
+        delivered = 0
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._push, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down without unsubscribing.
+                self.unsubscribe(subscription)
+                continue
+            delivered += 1
+        return delivered
+
+    def subscriber_count(self, key: Hashable | None = None) -> int:
+        """Return the number of subscribers for ``key`` or across all keys."""
+        with self._lock:
+            if key is not None:
+                return len(self._subscribers.get(key, ()))
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+def format_sse(message: dict) -> str:
+    """Serialize a broker message as a server-sent event frame."""
+    payload = json.dumps(message["data"], default=str)
+    return f"event: {message['event']}\ndata: {payload}\n\n"
+
+
+broker = EventBroker()
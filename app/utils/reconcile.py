@@ -0,0 +1,369 @@
+"""Reconcile stored files against the paths referenced by module results.
+
+Module handlers list the ``result_data`` fields that hold file paths in
+``file_fields``; those paths are relative to the upload folder, under a
+top-level directory named after the request token. The scanner reports:
+
+- orphans: files under the upload folder that no module references
+- missing: referenced paths with no file on disk
+
+References are streamed from every shard in token order and merged with
+the sorted top-level directory listing, so only the references of the
+directories being scanned are held in memory. The directories are scanned
+in parallel with ``os.scandir`` and their results written in order to
+``orphans.jsonl`` and ``missing.jsonl`` in the output directory. A
+checkpoint records the last finished directory and the report sizes at
+that point, so an interrupted run truncates the reports and resumes where
+it stopped::
+
+    python -m app.utils.reconcile --output reconcile/ [--quarantine DIR | --delete]
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import groupby
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from ..models import ClientRequest, Module
+
+CHECKPOINT_FILE = "checkpoint.json"
+ORPHANS_FILE = "orphans.jsonl"
+MISSING_FILE = "missing.jsonl"
+# Files younger than this may belong to a submission still in progress.
+DEFAULT_MIN_AGE = 3600
+# Finished directories between checkpoint writes.
+CHECKPOINT_EVERY = 100
+
+# Upload paths referenced by modules, mapped to the referencing module ID.
+References = Dict[str, int]
+
+
+def _file_fields() -> Dict[str, tuple[str, ...]]:
+    from ..modules import discover_modules, registry
+
+    if not registry:
+        discover_modules()
+    return {
+        kind: handler.file_fields
+        for kind, handler in registry.items()
+        if getattr(handler, "file_fields", ())
+    }
+
+
+def _top(path: str) -> str:
+    """Return the top-level directory of ``path``, ``""`` for loose files."""
+    top, sep, _ = path.partition("/")
+    return top if sep else ""
+
+
+def iter_file_references(
+    db: Session, file_fields: Dict[str, tuple[str, ...]], batch_size: int = 1000
+) -> Iterator[tuple[str, str, int]]:
+    """Yield ``(token, relative path, module ID)`` ordered by request token.
+
+    Rows are read through a streaming cursor ``batch_size`` at a time.
+    """
+    if not file_fields:
+        return
+    stmt = (
+        select(ClientRequest.token, Module.id, Module.kind, Module.result_data)
+        .join(ClientRequest, Module.request_id == ClientRequest.id)
+        .where(Module.kind.in_(list(file_fields)))
+        .order_by(ClientRequest.token)
+        .execution_options(yield_per=batch_size)
+    )
+    for token, module_id, kind, data in db.execute(stmt):
+        for field in file_fields[kind]:
+            value = (data or {}).get(field)
+            if isinstance(value, str) and value:
+                yield token, Path(value).as_posix(), module_id
+
+
+def _reference_streams(
+    stack: ExitStack, sessions: Iterable[sessionmaker], batch_size: int
+) -> Iterator[tuple[str, str, int]]:
+    """Merge the token-ordered references of every shard into one stream."""
+    file_fields = _file_fields()
+    streams = [
+        iter_file_references(stack.enter_context(maker()), file_fields, batch_size)
+        for maker in sessions
+    ]
+    return heapq.merge(*streams, key=itemgetter(0))
+
+
+def _misplaced_references(
+    sessions: Iterable[sessionmaker], batch_size: int
+) -> Dict[str, References]:
+    """Collect references stored outside their request's token directory.
+
+    Handlers never store such paths, so this is expected to stay small.
+    """
+    misplaced: Dict[str, References] = {}
+    with ExitStack() as stack:
+        for token, path, module_id in _reference_streams(stack, sessions, batch_size):
+            if _top(path) != token:
+                misplaced.setdefault(_top(path), {})[path] = module_id
+    return misplaced
+
+
+def _directories(
+    names: List[str],
+    references: Iterator[tuple[str, str, int]],
+    misplaced: Dict[str, References],
+) -> Iterator[tuple[str, References]]:
+    """Yield each top-level directory in order with the references it should hold.
+
+    ``names`` must be sorted; ``""`` stands for the loose files at the top.
+    """
+    yield "", dict(misplaced.get("", {}))
+    by_token = (
+        (token, {path: module_id for _, path, module_id in refs if _top(path) == token})
+        for token, refs in groupby(references, key=itemgetter(0))
+    )
+    on_disk = ((name, {}) for name in names)
+    merged = heapq.merge(on_disk, by_token, key=itemgetter(0))
+    for name, groups in groupby(merged, key=itemgetter(0)):
+        expected = dict(misplaced.get(name, {}))
+        for _, refs in groups:
+            expected.update(refs)
+        yield name, expected
+
+
+def _walk(root: Path, relative: str) -> Iterator[tuple[str, float]]:
+    """Yield ``(relative path, mtime)`` for every file below ``root / relative``."""
+    stack = [relative]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(root / current if current else root)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                path = f"{current}/{entry.name}" if current else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    # Top-level directories are scanned by their own tasks.
+                    if current:
+                        stack.append(path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield path, entry.stat(follow_symlinks=False).st_mtime
+
+
+def _reconcile_directory(
+    root: Path, directory: str, expected: Dict[str, int], cutoff: float
+) -> tuple[list[dict], list[dict]]:
+    """Compare one top-level directory (``""`` for loose files) with its references."""
+    orphans = []
+    seen = set()
+    for path, mtime in _walk(root, directory):
+        if path in expected:
+            seen.add(path)
+        elif mtime < cutoff:
+            orphans.append({"path": path, "mtime": mtime})
+    missing = [
+        {"path": path, "module_id": module_id}
+        for path, module_id in expected.items()
+        if path not in seen
+    ]
+    return orphans, missing
+
+
+def _load_checkpoint(output: Path) -> Dict[str, Any]:
+    try:
+        return json.loads((output / CHECKPOINT_FILE).read_text())
+    except FileNotFoundError:
+        return {"last": None, "orphans": 0, "missing": 0}
+
+
+def _save_checkpoint(output: Path, checkpoint: Dict[str, Any]) -> None:
+    tmp = output / f"{CHECKPOINT_FILE}.tmp"
+    tmp.write_text(json.dumps(checkpoint))
+    os.replace(tmp, output / CHECKPOINT_FILE)
+
+
+def _open_report(path: Path, offset: int):
+    """Open a report for appending after dropping records past ``offset``."""
+    report = open(path, "a")
+    report.truncate(min(offset, report.seek(0, os.SEEK_END)))
+    return report
+
+
+def _quarantine(root: Path, quarantine: Path) -> Callable[[str], None]:
+    def move(path: str) -> None:
+        target = quarantine / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(root / path), str(target))
+
+    return move
+
+
+def _delete(root: Path) -> Callable[[str], None]:
+    def remove(path: str) -> None:
+        (root / path).unlink(missing_ok=True)
+
+    return remove
+
+
+def reconcile(
+    base_path: str | Path,
+    sessions: Iterable[sessionmaker],
+    output: str | Path,
+    workers: int = 8,
+    min_age: float = DEFAULT_MIN_AGE,
+    quarantine: str | Path | None = None,
+    delete: bool = False,
+    restart: bool = False,
+    batch_size: int = 1000,
+) -> Dict[str, Any]:
+    """Scan ``base_path`` against the references in ``sessions``.
+
+    Orphans older than ``min_age`` seconds are reported and, if requested,
+    moved under ``quarantine`` or deleted. Missing files are only
+    reported. A previous run into ``output`` is resumed after its last
+    checkpoint unless ``restart`` is set. Returns counts for this run.
+
+    Memory use is bounded by the top-level directory listing, the
+    references of the directories in flight and any misplaced references.
+    """
+    if quarantine is not None and delete:
+        raise ValueError("choose either quarantine or delete, not both")
+    root = Path(base_path)
+    if quarantine is not None and Path(quarantine).resolve().is_relative_to(
+        root.resolve()
+    ):
+        raise ValueError("the quarantine directory must be outside the upload folder")
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    if restart:
+        (output / CHECKPOINT_FILE).unlink(missing_ok=True)
+    checkpoint = _load_checkpoint(output)
+    last = checkpoint["last"]
+
+    action: Callable[[str], None] | None = None
+    if quarantine is not None:
+        action = _quarantine(root, Path(quarantine))
+    elif delete:
+        action = _delete(root)
+
+    misplaced = _misplaced_references(sessions, batch_size)
+    with os.scandir(root) as entries:
+        names = sorted(
+            {entry.name for entry in entries if entry.is_dir(follow_symlinks=False)}
+            | set(misplaced) - {""}
+        )
+
+    cutoff = time.time() - min_age
+    summary = {"directories": 0, "orphans": 0, "missing": 0, "removed": 0}
+    in_flight: deque[tuple[str, Future]] = deque()
+
+    with ExitStack() as stack:
+        pool = stack.enter_context(ThreadPoolExecutor(max_workers=workers))
+        orphan_log = stack.enter_context(
+            _open_report(output / ORPHANS_FILE, checkpoint["orphans"])
+        )
+        missing_log = stack.enter_context(
+            _open_report(output / MISSING_FILE, checkpoint["missing"])
+        )
+
+        def save() -> None:
+            orphan_log.flush()
+            missing_log.flush()
+            _save_checkpoint(
+                output,
+                {
+                    "last": last,
+                    "orphans": orphan_log.tell(),
+                    "missing": missing_log.tell(),
+                },
+            )
+
+        def finish_next() -> None:
+            # Results are written in directory order, so everything up to
+            # ``last`` is in the reports when the checkpoint is saved.
+            nonlocal last
+            directory, future = in_flight.popleft()
+            orphans, missing = future.result()
+            for record in orphans:
+                if action is not None:
+                    action(record["path"])
+                    summary["removed"] += 1
+                orphan_log.write(json.dumps(record) + "\n")
+            for record in missing:
+                missing_log.write(json.dumps(record) + "\n")
+            summary["directories"] += 1
+            summary["orphans"] += len(orphans)
+            summary["missing"] += len(missing)
+            last = directory
+            if summary["directories"] % CHECKPOINT_EVERY == 0:
+                save()
+
+        references = _reference_streams(stack, sessions, batch_size)
+        for directory, expected in _directories(names, references, misplaced):
+            if last is not None and directory <= last:
+                continue
+            future = pool.submit(
+                _reconcile_directory, root, directory, expected, cutoff
+            )
+            in_flight.append((directory, future))
+            if len(in_flight) >= workers * 4:
+                finish_next()
+        while in_flight:
+            finish_next()
+        save()
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="reconcile", help="report directory")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--min-age",
+        type=float,
+        default=DEFAULT_MIN_AGE,
+        help="ignore files modified within this many seconds",
+    )
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--quarantine", help="move orphaned files under this directory")
+    group.add_argument("--delete", action="store_true", help="delete orphaned files")
+    parser.add_argument(
+        "--restart", action="store_true", help="discard the checkpoint and reports"
+    )
+    args = parser.parse_args()
+
+    from ..settings import get_settings
+    from . import database
+
+    summary = reconcile(
+        get_settings().UPLOAD_FOLDER,
+        database.shard_sessions,
+        args.output,
+        workers=args.workers,
+        min_age=args.min_age,
+        quarantine=args.quarantine,
+        delete=args.delete,
+        restart=args.restart,
+    )
+    print(
+        f"Scanned {summary['directories']} directories: "
+        f"{summary['orphans']} orphaned, {summary['missing']} missing, "
+        f"{summary['removed']} removed"
+    )
+
+
+if __name__ == "__main__":
+    main()
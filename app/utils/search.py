@@ -0,0 +1,176 @@
+"""SQLite FTS5 full-text search over requests and their module labels.
+
+The ``request_search`` index holds one row per request, keyed by the
+request ID, and is kept in sync by triggers on ``client_request`` and
+``module``. Each shard has its own index. Rebuild them for an existing
+database with::
+
+    python -m app.utils.search --rebuild
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+SEARCH_TABLE = "request_search"
+
+# Column weights for bm25 ranking: nickname, labels, descriptions.
+_WEIGHTS = (10.0, 5.0, 1.0)
+
+_MODULE_TEXT = """
+    UPDATE request_search SET
+        labels = (SELECT coalesce(group_concat(label, ' '), '')
+                  FROM module WHERE request_id = {ref}.request_id),
+        descriptions = (SELECT coalesce(group_concat(description, ' '), '')
+                        FROM module WHERE request_id = {ref}.request_id)
+    WHERE rowid = {ref}.request_id;
+"""
+
+_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS request_search USING fts5(
+        nickname, labels, descriptions, prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS request_search_request_insert
+    AFTER INSERT ON client_request BEGIN
+        INSERT INTO request_search(rowid, nickname, labels, descriptions)
+        VALUES (new.id, coalesce(new.nickname, ''), '', '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS request_search_request_update
+    AFTER UPDATE OF nickname ON client_request BEGIN
+        UPDATE request_search SET nickname = coalesce(new.nickname, '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS request_search_request_delete
+    AFTER DELETE ON client_request BEGIN
+        DELETE FROM request_search WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS request_search_module_insert
+    AFTER INSERT ON module BEGIN {_MODULE_TEXT.format(ref="new")} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS request_search_module_update
+    AFTER UPDATE OF label, description, request_id ON module BEGIN
+        {_MODULE_TEXT.format(ref="old")}
+        {_MODULE_TEXT.format(ref="new")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS request_search_module_delete
+    AFTER DELETE ON module BEGIN {_MODULE_TEXT.format(ref="old")} END
+    """,
+]
+
+_REBUILD = [
+    "DELETE FROM request_search",
+    """
+    INSERT INTO request_search(rowid, nickname, labels, descriptions)
+    SELECT r.id,
+           coalesce(r.nickname, ''),
+           coalesce(group_concat(m.label, ' '), ''),
+           coalesce(group_concat(m.description, ' '), '')
+    FROM client_request r LEFT JOIN module m ON m.request_id = r.id
+    GROUP BY r.id
+    """,
+]
+
+
+def search_supported(bind: Engine | Connection) -> bool:
+    """Return whether ``bind`` is a SQLite database, which FTS5 requires."""
+    return bind.dialect.name == "sqlite"
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """Create the search table and triggers if missing.
+
+    A newly created index is populated from existing rows. Returns whether
+    the index had to be created.
+    """
+    created = not inspect(engine).has_table(SEARCH_TABLE)
+    with engine.begin() as conn:
+        for statement in _DDL:
+            conn.execute(text(statement))
+        if created:
+            _rebuild(conn)
+    return created
+
+
+def _rebuild(conn: Connection) -> None:
+    for statement in _REBUILD:
+        conn.execute(text(statement))
+
+
+def rebuild_search_index(engine: Engine) -> int:
+    """Repopulate the search index from scratch; returns the rows indexed."""
+    ensure_search_index(engine)
+    with engine.begin() as conn:
+        _rebuild(conn)
+        return conn.execute(text("SELECT count(*) FROM request_search")).scalar_one()
+
+
+def build_match_query(q: str) -> str | None:
+    """Turn free text into an FTS5 query matching every term as a prefix."""
+    terms = re.findall(r"\w+", q)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_requests(
+    db: Session, q: str, limit: int = 20, offset: int = 0
+) -> list[dict]:
+    """Return requests matching ``q`` ordered by relevance."""
+    match = build_match_query(q)
+    if match is None:
+        return []
+    stmt = text(
+        f"""
+        SELECT r.id, r.token, r.nickname, r.created_at, r.completed_at,
+               bm25(request_search, {", ".join(map(str, _WEIGHTS))}) AS rank
+        FROM request_search
+        JOIN client_request r ON r.id = request_search.rowid
+        WHERE request_search MATCH :match
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+        """
+    )
+    rows = db.execute(stmt, {"match": match, "limit": limit, "offset": offset})
+    return [dict(row) for row in rows.mappings()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rebuild", action="store_true", help="repopulate the index from scratch"
+    )
+    args = parser.parse_args()
+
+    from . import database
+
+    if not search_supported(database.engine):
+        parser.error("full-text search requires a SQLite database")
+    for shard, shard_engine in enumerate(database.engines):
+        if args.rebuild:
+            count = rebuild_search_index(shard_engine)
+            print(f"Shard {shard}: indexed {count} requests")
+        elif ensure_search_index(shard_engine):
+            print(f"Shard {shard}: created and populated the search index")
+        else:
+            print(f"Shard {shard}: search index already exists; use --rebuild")
+
+
+if __name__ == "__main__":
+    main()
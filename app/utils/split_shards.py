@@ -0,0 +1,149 @@
+"""Split a single FileMaster database into shard databases.
+
+Run offline, with the server stopped, after configuring the shards::
+
+    SHARD_COUNT=4 DATABASE_URL='sqlite:///./filemaster_{shard}.db' \\
+        python -m app.utils.split_shards sqlite:///./filemaster.db
+
+Each request moves to the shard selected by its token, together with its
+modules, access logs, change feed entries and rollups. Row IDs are offset
+into the target shard's ID range, so IDs handed out before the split
+change. Users are copied to every shard. The target shards must be empty.
+"""
+
+from __future__ import annotations
+
+import argparse
+from contextlib import ExitStack
+
+from sqlalchemy import create_engine, func, insert, inspect, select
+from sqlalchemy.engine import Connection, Engine
+
+from ..models import Base, RollupState
+from .analytics import ROLLUP_NAME
+from .database import SHARD_ID_SPAN, init_db, shard_for_token
+
+# Tables whose rows belong to one request, parents before children.
+REQUEST_TABLES = [
+    "client_request",
+    "module",
+    "access_log",
+    "change_log",
+    "access_log_daily",
+]
+# Columns holding sharded IDs that must be moved into the shard's range.
+ID_COLUMNS = ("id", "seq", "request_id", "module_id")
+
+
+def _copy_table(
+    name: str,
+    source: Connection,
+    targets: list[Connection],
+    request_shards: dict[int, int],
+    batch_size: int,
+) -> tuple[int, int]:
+    """Copy one table into the shards; returns (copied, skipped) row counts."""
+    table = Base.metadata.tables[name]
+    source_columns = {col["name"] for col in inspect(source).get_columns(name)}
+    columns = [col for col in table.columns if col.name in source_columns]
+    owner = "id" if name == "client_request" else "request_id"
+    buckets: list[list[dict]] = [[] for _ in targets]
+    copied = skipped = 0
+
+    def flush(shard: int) -> None:
+        if buckets[shard]:
+            targets[shard].execute(insert(table), buckets[shard])
+            buckets[shard].clear()
+
+    rows = source.execution_options(yield_per=batch_size).execute(select(*columns))
+    for row in rows:
+        data = dict(row._mapping)
+        shard = request_shards.get(data[owner])
+        if shard is None:
+            # Rows whose request no longer exists have nowhere to go.
+            skipped += 1
+            continue
+        offset = shard * SHARD_ID_SPAN
+        for key in ID_COLUMNS:
+            if data.get(key) is not None:
+                data[key] += offset
+        buckets[shard].append(data)
+        copied += 1
+        if len(buckets[shard]) >= batch_size:
+            flush(shard)
+    for shard in range(len(targets)):
+        flush(shard)
+    return copied, skipped
+
+
+def split_database(
+    source: Engine, targets: list[Engine], batch_size: int = 1000
+) -> dict[str, tuple[int, int]]:
+    """Copy every request in ``source`` to its shard among ``targets``.
+
+    Returns the copied and skipped row counts per table.
+    """
+    init_db(targets)
+    requests = Base.metadata.tables["client_request"]
+    for shard, target in enumerate(targets):
+        with target.connect() as conn:
+            if conn.scalar(select(func.count()).select_from(requests)):
+                raise ValueError(f"shard {shard} already contains requests")
+
+    source_tables = set(inspect(source).get_table_names())
+    report: dict[str, tuple[int, int]] = {}
+    with ExitStack() as stack:
+        src = stack.enter_context(source.connect())
+        conns = [stack.enter_context(target.begin()) for target in targets]
+
+        request_shards = {
+            request_id: shard_for_token(token, len(targets))
+            for request_id, token in src.execute(select(requests.c.id, requests.c.token))
+        }
+
+        if "user" in source_tables:
+            user_table = Base.metadata.tables["user"]
+            users = [dict(row._mapping) for row in src.execute(select(user_table))]
+            for conn in conns:
+                if users:
+                    conn.execute(insert(user_table), users)
+
+        for name in REQUEST_TABLES:
+            if name in source_tables:
+                report[name] = _copy_table(name, src, conns, request_shards, batch_size)
+
+        watermark = 0
+        if "rollup_state" in source_tables:
+            watermark = src.scalar(
+                select(RollupState.last_id).where(RollupState.name == ROLLUP_NAME)
+            ) or 0
+        # Start every shard's watermark inside its own ID range.
+        for shard, conn in enumerate(conns):
+            last_id = watermark + shard * SHARD_ID_SPAN
+            conn.execute(insert(RollupState), {"name": ROLLUP_NAME, "last_id": last_id})
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="URL of the unsharded source database")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    from . import database
+
+    if len(database.engines) < 2:
+        parser.error("configure SHARD_COUNT > 1 and a DATABASE_URL with {shard}")
+    target_urls = {str(engine.url) for engine in database.engines}
+    if args.source in target_urls:
+        parser.error("the source database must not be one of the shards")
+
+    report = split_database(
+        create_engine(args.source, future=True), database.engines, args.batch_size
+    )
+    for name, (copied, skipped) in report.items():
+        print(f"{name}: copied {copied}, skipped {skipped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import main
+from app.main import app, get_db
+from app.models import Base
+from app.settings import get_settings
+from app.utils import database, encryption
+from app.utils.search import ensure_search_index
+
+
+@pytest.fixture
+def test_session(tmp_path, monkeypatch):
+    """Route the app's DB dependency to a temporary SQLite database."""
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db", future=True)
+    Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
+    TestSession = sessionmaker(bind=engine, autoflush=False, future=True)
+
+    def override_get_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    # Startup, shutdown and streaming endpoints open their own sessions, and
+    # startup initialises the engines; keep all of it off the tracked database.
+    monkeypatch.setattr(main, "SessionLocal", TestSession)
+    monkeypatch.setattr(database, "shard_sessions", [TestSession])
+    monkeypatch.setattr(database, "engines", [engine])
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(
+        get_settings(), "ENCRYPTION_KEY", encryption.generate_key().decode()
+    )
+    return TestSession
+
+
+@pytest.fixture
+def client(test_session):
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,33 @@
+"""Gunicorn configuration for multi-worker deployments in preload mode.
+
+    poetry run gunicorn app.main:app -c gunicorn.conf.py
+
+The app is imported once in the master process, which then runs the
+one-time startup work before forking workers. See docs/setup.md.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported and before workers fork.
+    from app.main import preload
+
+    preload()
+
+
+def post_fork(server, worker):
+    # Workers start from the settings the master cached when it imported the
+    # app. A SIGHUP to the master replaces the workers without re-importing
+    # it, so re-read the settings here to pick up changes to .env.
+    from app.settings import reload_settings
+
+    changed = reload_settings()
+    if changed:
+        server.log.info("Worker %s reloaded %s", worker.pid, ", ".join(sorted(changed)))
@@ -0,0 +1,52 @@
+import asyncio
+
+from app.utils.admission import AdmissionLimiter, admission
+
+
+def test_limiter_queues_then_sheds():
+    async def scenario():
+        limiter = AdmissionLimiter("uploads", limit=1, queue_size=1, timeout=1)
+        assert await limiter.acquire()
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+        assert not await limiter.acquire()
+        limiter.release(0.5)
+        assert await queued
+        assert limiter.active == 1 and limiter.queued == 0
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert (limiter.admitted, limiter.rejected) == (2, 1)
+
+
+def test_limiter_times_out_and_estimates_upload_retry():
+    async def scenario():
+        limiter = AdmissionLimiter(
+            "uploads", limit=1, queue_size=4, timeout=0.01, expected_bytes=10_000
+        )
+        assert await limiter.acquire()
+        assert not await limiter.acquire()
+        limiter.release(2.0, received=1_000)
+        return limiter
+
+    limiter = asyncio.run(scenario())
+    assert limiter.timed_out == 1 and limiter.queued == 0
+    # 10 KB expected at an observed 500 B/s holds a slot for 20 seconds.
+    assert limiter.retry_after() == 20
+
+
+def test_full_read_queue_returns_503(client, monkeypatch):
+    reads = admission.limiters["reads"]
+    monkeypatch.setattr(reads, "limit", 1)
+    monkeypatch.setattr(reads, "queue_size", 0)
+    monkeypatch.setattr(reads, "active", 1)
+    rejected = reads.rejected
+
+    response = client.get("/customer/sometoken")
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+
+    stats = client.get("/admin/admission").json()
+    assert stats["reads"]["rejected"] == rejected + 1
+    assert stats["reads"]["active"] == 1
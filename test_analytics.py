@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from app.models import AccessLog, AccessLogDaily, ClientRequest
+from app.utils.analytics import (
+    daily_activity,
+    prune_access_logs,
+    request_activity,
+    rollup_access_logs,
+)
+
+
+def test_rollup_is_incremental_and_prune_keeps_recent(test_session):
+    old = datetime.utcnow() - timedelta(days=100)
+    with test_session() as db:
+        db.add(ClientRequest(id=1, token="t1"))
+        db.add_all(
+            [AccessLog(request_id=1, action="view", timestamp=old) for _ in range(3)]
+            + [AccessLog(request_id=1, action="submit")]
+        )
+        db.commit()
+
+        assert rollup_access_logs(db, batch_size=2) == 4
+        db.add(AccessLog(request_id=1, action="submit"))
+        db.commit()
+        assert rollup_access_logs(db) == 1
+
+        counts = {(r["day"], r["action"]): r["count"] for r in request_activity(db, 1)}
+        assert counts[(old.date(), "view")] == 3
+        assert counts[(datetime.utcnow().date(), "submit")] == 2
+        assert sum(r["count"] for r in daily_activity(db, since=old.date())) == 5
+
+        assert prune_access_logs(db, retention_days=90, batch_size=2) == 3
+        assert db.query(AccessLog).count() == 2
+        assert db.query(AccessLogDaily).count() == 2
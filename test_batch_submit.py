@@ -0,0 +1,67 @@
+from app.models import AccessLog, Module
+
+
+def _create(client, kinds):
+    req = client.post("/requests", json={"nickname": "batch"}).json()
+    ids = [
+        client.post(f"/requests/{req['id']}/modules", json={"kind": kind}).json()["id"]
+        for kind in kinds
+    ]
+    return req, ids
+
+
+def test_batch_submit_completes_request(client):
+    req, (ssn_id, dl_id) = _create(client, ["ssn", "drivers_license"])
+    resp = client.post(
+        f"/customer/{req['token']}/submit",
+        json={"modules": {ssn_id: {"ssn": "123-45-6789"}, dl_id: {"notes": "hi"}}},
+    )
+    assert resp.status_code == 200
+    assert all(m["completed"] for m in resp.json())
+    assert client.get(f"/requests/{req['id']}").json()["completed_at"]
+
+
+def test_batch_submit_is_all_or_nothing(client, test_session):
+    req, (ssn_id, dl_id) = _create(client, ["ssn", "drivers_license"])
+    resp = client.post(
+        f"/customer/{req['token']}/submit",
+        json={"modules": {ssn_id: {"ssn": "bad"}, dl_id: {"notes": "hi"}}},
+    )
+    assert resp.status_code == 422
+    assert list(resp.json()["detail"]["errors"]) == [str(ssn_id)]
+    with test_session() as db:
+        assert not any(m.completed for m in db.query(Module))
+        assert db.query(AccessLog).count() == 0
+
+
+def test_batch_submit_rejects_empty_batch(client):
+    req, _ = _create(client, ["drivers_license"])
+    resp = client.post(f"/customer/{req['token']}/submit", json={"modules": {}})
+    assert resp.status_code == 422
+
+
+def test_resubmission_keeps_completion(client):
+    req, (dl_id,) = _create(client, ["drivers_license"])
+    submit = {"modules": {dl_id: {"notes": "hi"}}}
+    client.post(f"/customer/{req['token']}/submit", json=submit)
+    completed_at = client.get(f"/requests/{req['id']}").json()["completed_at"]
+    client.post(f"/customer/{req['token']}/submit", json=submit)
+    assert client.get(f"/requests/{req['id']}").json()["completed_at"] == completed_at
+    changes = client.get("/changes").json()["changes"]
+    assert [c["action"] for c in changes].count("request_completed") == 1
+
+
+def test_attaching_module_reopens_completed_request(client):
+    req, (dl_id,) = _create(client, ["drivers_license"])
+    client.post(f"/customer/{req['token']}/submit", json={"modules": {dl_id: {}}})
+    assert client.get(f"/requests/{req['id']}").json()["completed_at"]
+
+    extra = client.post(
+        f"/requests/{req['id']}/modules", json={"kind": "drivers_license"}
+    ).json()
+    assert client.get(f"/requests/{req['id']}").json()["completed_at"] is None
+
+    client.post(f"/customer/{req['token']}/submit", json={"modules": {extra["id"]: {}}})
+    assert client.get(f"/requests/{req['id']}").json()["completed_at"]
+    changes = client.get("/changes").json()["changes"]
+    assert [c["action"] for c in changes].count("request_completed") == 2
@@ -0,0 +1,26 @@
+def test_change_feed_returns_delta_after_cursor(client):
+    req = client.post("/requests", json={"nickname": "feed"}).json()
+    module = client.post(
+        f"/requests/{req['id']}/modules", json={"kind": "drivers_license"}
+    ).json()
+
+    feed = client.get("/changes").json()
+    assert [c["action"] for c in feed["changes"]] == [
+        "request_created",
+        "module_attached",
+    ]
+    assert feed["changes"][1]["module_id"] == module["id"]
+    assert feed["oldest"] == feed["changes"][0]["seq"]
+
+    client.post(f"/modules/{module['id']}/submit", json={"notes": "done"})
+    delta = client.get("/changes", params={"after": feed["next"]}).json()
+    assert [c["action"] for c in delta["changes"]] == [
+        "module_completed",
+        "request_completed",
+    ]
+
+
+def test_change_feed_long_poll_times_out_empty(client):
+    feed = client.get("/changes", params={"after": 10, "wait": 0.05}).json()
+    assert feed["changes"] == []
+    assert feed["next"] == 10
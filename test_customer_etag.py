@@ -0,0 +1,46 @@
+from app.models import AccessLog, ClientRequest
+from app.utils.access_tracker import last_accessed
+
+
+def test_customer_payload_revalidates_with_etag(client, test_session):
+    last_accessed.drain()
+    req = client.post("/requests", json={"nickname": "etag"}).json()
+    first = client.get(f"/customer/{req['token']}")
+    etag = first.headers["etag"]
+
+    cached = client.get(f"/customer/{req['token']}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    module = client.post(
+        f"/requests/{req['id']}/modules", json={"kind": "drivers_license"}
+    ).json()
+    changed = client.get(f"/customer/{req['token']}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+    client.post(f"/modules/{module['id']}/submit", json={"notes": "done"})
+    resubmitted = client.get(
+        f"/customer/{req['token']}",
+        headers={"If-None-Match": changed.headers["etag"]},
+    )
+    assert resubmitted.status_code == 200
+    assert resubmitted.json()["modules"][0]["completed"]
+    with test_session() as db:
+        # Views are buffered with the access times until the next flush.
+        assert db.query(AccessLog).filter_by(action="view").count() == 0
+        last_accessed.flush(db)
+        assert db.query(AccessLog).filter_by(action="view").count() == 4
+
+
+def test_last_accessed_writes_are_coalesced(test_session):
+    with test_session() as db:
+        db.add_all([ClientRequest(id=1, token="a"), ClientRequest(id=2, token="b")])
+        db.commit()
+        last_accessed.drain()
+        for _ in range(3):
+            last_accessed.touch(1)
+        last_accessed.touch(2)
+        assert last_accessed.flush(db, interval=3600) == 0
+        assert last_accessed.flush(db) == 2
+        assert all(r.last_accessed for r in db.query(ClientRequest))
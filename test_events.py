@@ -0,0 +1,107 @@
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+from app.main import app
+from app.models import ClientRequest
+from app.utils.events import EventBroker, format_sse
+
+
+def test_publish_from_thread_reaches_subscriber():
+    broker = EventBroker(maxsize=2)
+
+    async def run():
+        subscription = broker.subscribe(1)
+        thread = threading.Thread(
+            target=lambda: [broker.publish(1, "tick", {"n": n}) for n in range(3)]
+        )
+        thread.start()
+        thread.join()
+        events = await subscription.get(timeout=1)
+        broker.unsubscribe(subscription)
+        return subscription, events
+
+    subscription, events = asyncio.run(run())
+    assert [e["data"]["n"] for e in events] == [1, 2]
+    assert subscription.dropped == 1
+    assert broker.subscriber_count() == 0
+
+
+def test_get_times_out_without_events():
+    broker = EventBroker()
+
+    async def run():
+        subscription = broker.subscribe("idle")
+        return await subscription.get(timeout=0.01)
+
+    assert asyncio.run(run()) is None
+
+
+def test_format_sse():
+    frame = format_sse({"event": "module_completed", "data": {"id": 3}})
+    assert frame == 'event: module_completed\ndata: {"id": 3}\n\n'
+
+
+def test_event_stream_reports_committed_progress(client, test_session):
+    req = client.post("/requests", json={"nickname": "live"}).json()
+
+    async def run():
+        inbox: asyncio.Queue = asyncio.Queue()
+        frames: list[str] = []
+        arrived = asyncio.Event()
+
+        async def receive():
+            return await inbox.get()
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                frames.append(message["body"].decode())
+                arrived.set()
+
+        async def next_frame(event):
+            while not any(event in frame for frame in frames):
+                arrived.clear()
+                await asyncio.wait_for(arrived.wait(), 5)
+            return next(frame for frame in frames if event in frame)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": f"/requests/{req['id']}/events",
+            "raw_path": f"/requests/{req['id']}/events".encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [],
+            "client": ("testclient", 1),
+            "server": ("testserver", 80),
+        }
+        stream = asyncio.create_task(app(scope, receive, send))
+        await next_frame(": connected")
+
+        module = await asyncio.to_thread(
+            client.post,
+            f"/requests/{req['id']}/modules",
+            json={"kind": "drivers_license"},
+        )
+        attached = await next_frame("module_attached")
+        await asyncio.to_thread(
+            client.post, f"/modules/{module.json()['id']}/submit", json={"notes": "x"}
+        )
+        completed = await next_frame("request_completed")
+        # Events are published after the commit, so the data is visible.
+        with test_session() as db:
+            assert db.get(ClientRequest, req["id"]).completed_at is not None
+
+        await inbox.put({"type": "http.disconnect"})
+        await asyncio.wait_for(stream, 5)
+        return attached, completed
+
+    attached, completed = asyncio.run(run())
+    assert json.loads(attached.split("data: ")[1])["kind"] == "drivers_license"
+    data = json.loads(completed.split("data: ")[1])
+    datetime.fromisoformat(data["completed_at"])
+    assert "T" in data["completed_at"]
@@ -0,0 +1,76 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, ClientRequest, Module
+from app.modules import discover_modules
+from app.settings import get_settings
+from app.utils import encryption
+from app.utils.data_viewer import export_ndjson
+
+
+def test_export_ndjson_decrypts_and_filters(tmp_path):
+    discover_modules()
+    key = encryption.generate_key()
+    engine = create_engine(f"sqlite:///{tmp_path}/export.db", future=True)
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine, future=True)() as db:
+        req = ClientRequest(token="abc", nickname="export")
+        req.modules = [
+            Module(
+                kind="ssn",
+                completed=True,
+                completed_at=datetime(2024, 1, 2),
+                result_data={"ssn": encryption.encrypt("123-45-6789", key).decode()},
+            ),
+            Module(
+                kind="drivers_license",
+                completed=True,
+                completed_at=datetime(2024, 1, 1),
+                result_data={"notes": "old"},
+            ),
+            Module(kind="sample", completed=False),
+        ]
+        db.add(req)
+        db.commit()
+
+        chunks = list(
+            export_ndjson(db, key, batch_size=1, workers=2, include_token=True)
+        )
+        rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+        assert len(chunks) == 2
+        assert [r["kind"] for r in rows] == ["ssn", "drivers_license"]
+        assert rows[0]["result_data"]["ssn"] == "123-45-6789"
+        assert rows[0]["token"] == "abc"
+
+        recent = "".join(export_ndjson(db, key, since=datetime(2024, 1, 2)))
+        assert [json.loads(line)["kind"] for line in recent.splitlines()] == ["ssn"]
+        only_dl = "".join(export_ndjson(db, key, kinds=["drivers_license"]))
+        assert len(only_dl.splitlines()) == 1
+
+
+def test_export_endpoint_omits_sensitive_fields_by_default(
+    client, test_session, monkeypatch
+):
+    key = get_settings().ENCRYPTION_KEY.encode()
+    with test_session() as db:
+        req = ClientRequest(token="abc")
+        req.modules = [
+            Module(
+                kind="ssn",
+                completed=True,
+                result_data={"ssn": encryption.encrypt("123-45-6789", key).decode()},
+            )
+        ]
+        db.add(req)
+        db.commit()
+
+    row = json.loads(client.get("/admin/export.ndjson").text)
+    assert "ssn" not in row["result_data"]
+    assert "token" not in row
+
+    monkeypatch.setattr(get_settings(), "EXPORT_DECRYPT_SENSITIVE", True)
+    row = json.loads(client.get("/admin/export.ndjson").text)
+    assert row["result_data"]["ssn"] == "123-45-6789"
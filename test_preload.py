@@ -0,0 +1,42 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app import main
+from app.utils import database
+
+
+def test_fork_hook_drops_inherited_connections(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/fork.db", future=True)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert engine.pool.checkedin() == 1
+    monkeypatch.setattr(database, "engines", [engine])
+
+    database._dispose_after_fork()
+    assert engine.pool.checkedin() == 0
+
+
+def test_preloaded_worker_skips_startup_work(test_session, monkeypatch):
+    def fail():
+        raise AssertionError("startup work repeated in a preloaded worker")
+
+    monkeypatch.setattr(main, "_preloaded", True)
+    monkeypatch.setattr(main, "load_modules", fail)
+    monkeypatch.setattr(main, "run_maintenance", fail)
+    monkeypatch.setattr(main, "_pages", {"index.html": "<p>cached</p>"})
+    with TestClient(main.app) as client:
+        assert client.get("/").text == "<p>cached</p>"
+
+
+def test_worker_startup_leaves_maintenance_to_admin_endpoints(
+    test_session, monkeypatch
+):
+    def fail():
+        raise AssertionError("maintenance run during worker startup")
+
+    monkeypatch.setattr(main, "run_maintenance", fail)
+    with TestClient(main.app) as client:
+        assert client.post("/admin/analytics/rollup").json() == {
+            "rolled_up": 0,
+            "pruned": 0,
+        }
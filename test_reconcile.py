@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from app.models import ClientRequest, Module
+from app.utils import reconcile as reconcile_module
+from app.utils.reconcile import reconcile
+
+
+def test_reconcile_reports_orphans_and_missing_files(test_session, tmp_path):
+    uploads = tmp_path / "uploads"
+    (uploads / "tok1" / "drivers_license").mkdir(parents=True)
+    (uploads / "tok1" / "drivers_license" / "front.jpg").write_bytes(b"front")
+    (uploads / "tok1" / "drivers_license" / "stray.jpg").write_bytes(b"stray")
+    (uploads / "loose.pdf").write_bytes(b"loose")
+    with test_session() as db:
+        req = ClientRequest(token="tok1")
+        req.modules = [
+            Module(
+                kind="drivers_license",
+                result_data={
+                    "front_image": "tok1/drivers_license/front.jpg",
+                    "back_image": "tok1/drivers_license/back.jpg",
+                },
+            )
+        ]
+        db.add(req)
+        db.commit()
+        module_id = req.modules[0].id
+
+    output = tmp_path / "report"
+    quarantine = tmp_path / "quarantine"
+    summary = reconcile(
+        uploads, [test_session], output, min_age=0, quarantine=quarantine
+    )
+    assert summary == {"directories": 2, "orphans": 2, "missing": 1, "removed": 2}
+
+    orphans = [json.loads(line)["path"] for line in open(output / "orphans.jsonl")]
+    assert sorted(orphans) == ["loose.pdf", "tok1/drivers_license/stray.jpg"]
+    missing = [json.loads(line) for line in open(output / "missing.jsonl")]
+    assert missing == [
+        {"path": "tok1/drivers_license/back.jpg", "module_id": module_id}
+    ]
+    assert (quarantine / "tok1" / "drivers_license" / "stray.jpg").exists()
+    assert (uploads / "tok1" / "drivers_license" / "front.jpg").exists()
+
+    # Finished directories are skipped when the run is resumed.
+    assert reconcile(uploads, [test_session], output, min_age=0)["directories"] == 0
+    assert reconcile(uploads, [test_session], output, restart=True)["orphans"] == 0
+
+
+def test_resumed_reconcile_does_not_duplicate_records(
+    test_session, tmp_path, monkeypatch
+):
+    uploads = tmp_path / "uploads"
+    for name in ("a", "b", "c"):
+        (uploads / name).mkdir(parents=True)
+        (uploads / name / "stray.jpg").write_bytes(b"x")
+    output = tmp_path / "report"
+    monkeypatch.setattr(reconcile_module, "CHECKPOINT_EVERY", 2)
+    scan = reconcile_module._reconcile_directory
+
+    def crash_on_c(root, directory, expected, cutoff):
+        if directory == "c":
+            raise OSError("disk went away")
+        return scan(root, directory, expected, cutoff)
+
+    monkeypatch.setattr(reconcile_module, "_reconcile_directory", crash_on_c)
+    with pytest.raises(OSError):
+        reconcile(uploads, [test_session], output, workers=1, min_age=0)
+
+    monkeypatch.setattr(reconcile_module, "_reconcile_directory", scan)
+    summary = reconcile(uploads, [test_session], output, min_age=0)
+    assert summary["directories"] == 2
+    orphans = [json.loads(line)["path"] for line in open(output / "orphans.jsonl")]
+    assert orphans == ["a/stray.jpg", "b/stray.jpg", "c/stray.jpg"]
@@ -0,0 +1,18 @@
+def test_search_matches_prefixes_across_nickname_and_labels(client):
+    smith = client.post("/requests", json={"nickname": "John Smith - 2025 Camry"}).json()
+    jones = client.post("/requests", json={"nickname": "Ann Jones"}).json()
+    client.post(
+        f"/requests/{jones['id']}/modules",
+        json={"kind": "drivers_license", "label": "Camry trade-in licence"},
+    )
+
+    def ids(q, **params):
+        resp = client.get("/admin/search", params={"q": q, **params})
+        assert resp.status_code == 200
+        return [r["id"] for r in resp.json()["results"]]
+
+    assert ids("smi cam") == [smith["id"]]
+    assert ids("camry") == [smith["id"], jones["id"]]
+    assert ids("camry", limit=1, offset=1) == [jones["id"]]
+    assert ids("licen") == [jones["id"]]
+    assert ids("!!") == []
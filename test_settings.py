@@ -0,0 +1,20 @@
+from app.settings import get_settings, reload_settings, subscribe, unsubscribe
+
+
+def test_reload_updates_cached_settings_in_place(monkeypatch):
+    settings = get_settings()
+    original = settings.SSE_BUFFER_SIZE
+    seen = []
+    callback = subscribe(lambda s, changed: seen.append(changed))
+    monkeypatch.setenv("SSE_BUFFER_SIZE", str(original + 1))
+    try:
+        assert reload_settings() == {"SSE_BUFFER_SIZE"}
+        assert get_settings() is settings
+        assert settings.SSE_BUFFER_SIZE == original + 1
+        assert seen == [{"SSE_BUFFER_SIZE"}]
+        assert reload_settings() == set()
+    finally:
+        unsubscribe(callback)
+        monkeypatch.undo()
+        reload_settings()
+    assert settings.SSE_BUFFER_SIZE == original
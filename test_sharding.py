@@ -0,0 +1,112 @@
+import pytest
+from sqlalchemy import create_engine, func, select, text
+
+from app.models import AccessLog, AccessLogDaily, Base, ClientRequest, Module
+from app.settings import Settings
+from app.utils.analytics import rollup_access_logs
+from app.utils.database import (
+    SHARD_ID_SPAN,
+    init_db,
+    make_sessionmaker,
+    new_token,
+    shard_for_id,
+    shard_for_token,
+    shard_urls,
+)
+from app.utils.split_shards import split_database
+
+
+def _shards(tmp_path, count):
+    return [
+        create_engine(f"sqlite:///{tmp_path}/shard_{i}.db", future=True)
+        for i in range(count)
+    ]
+
+
+def test_new_token_routes_to_requested_shard():
+    for shard in range(3):
+        assert shard_for_token(new_token(3, shard), 3) == shard
+    assert len(new_token(1)) == 32
+
+
+def test_shard_urls_validates_configuration():
+    urls = shard_urls(Settings(DATABASE_URL="sqlite:///./fm_{shard}.db", SHARD_COUNT=2))
+    assert urls == ["sqlite:///./fm_0.db", "sqlite:///./fm_1.db"]
+    for settings in (
+        Settings(DATABASE_URL="sqlite:///./fm_{shard}.db", SHARD_COUNT=0),
+        Settings(DATABASE_URL="sqlite:///./fm_{shard}.db", SHARD_COUNT=257),
+        Settings(DATABASE_URL="sqlite:///./fm.db", SHARD_COUNT=2),
+        Settings(DATABASE_URL="postgresql://db/fm_{shard}", SHARD_COUNT=2),
+    ):
+        with pytest.raises(ValueError):
+            shard_urls(settings)
+
+
+def test_sharded_session_keeps_request_rows_together(tmp_path):
+    engines = _shards(tmp_path, 2)
+    init_db(engines)
+    Session = make_sessionmaker(engines)
+    with Session() as db:
+        req = ClientRequest(token=new_token(2, 1), nickname="rooftop")
+        req.modules = [Module(kind="ssn", label="SSN")]
+        db.add(req)
+        db.flush()
+        db.add(AccessLog(request_id=req.id, action="view"))
+        db.commit()
+        request_id, token, module_id = req.id, req.token, req.modules[0].id
+
+    assert shard_for_id(request_id) == shard_for_id(module_id) == 1
+    with engines[0].connect() as conn:
+        assert conn.scalar(text("SELECT count(*) FROM client_request")) == 0
+    with Session() as db:
+        found = db.query(ClientRequest).filter(ClientRequest.token == token).one()
+        assert found.id == request_id
+        assert [m.id for m in found.modules] == [module_id]
+        assert db.get(Module, module_id).request is found
+        assert db.get(ClientRequest, 5 * SHARD_ID_SPAN) is None
+
+
+def test_split_database_moves_requests_to_token_shards(tmp_path):
+    source = create_engine(f"sqlite:///{tmp_path}/single.db", future=True)
+    Base.metadata.create_all(source)
+    tokens = [new_token(2, shard) for shard in (0, 1, 1)]
+    with make_sessionmaker([source])() as db:
+        for token in tokens:
+            req = ClientRequest(token=token, nickname=f"deal {token[:4]}")
+            req.modules = [Module(kind="ssn", label="Social")]
+            req.access_logs = [AccessLog(action="view")]
+            db.add(req)
+        db.commit()
+
+    targets = _shards(tmp_path, 2)
+    report = split_database(source, targets, batch_size=1)
+    assert report["module"] == (3, 0)
+
+    Session = make_sessionmaker(targets)
+    with Session() as db:
+        for token in tokens:
+            req = db.query(ClientRequest).filter(ClientRequest.token == token).one()
+            assert shard_for_id(req.id) == shard_for_token(token, 2)
+            assert [m.label for m in req.modules] == ["Social"]
+            assert req.access_logs[0].module_id is None
+    with targets[1].connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(ClientRequest)) == 2
+        indexed = conn.scalar(
+            text("SELECT count(*) FROM request_search WHERE request_search MATCH 'social'")
+        )
+        assert indexed == 2
+
+
+def test_rollup_starts_at_shard_id_range(tmp_path):
+    engines = _shards(tmp_path, 2)
+    init_db(engines)
+    with make_sessionmaker([engines[1]])() as db:
+        req = ClientRequest(token=new_token(2, 1))
+        req.access_logs = [AccessLog(action="view"), AccessLog(action="view")]
+        db.add(req)
+        db.commit()
+        assert shard_for_id(req.access_logs[0].id) == 1
+
+        assert rollup_access_logs(db, batch_size=1) == 2
+        assert db.scalar(select(AccessLogDaily.count)) == 2
+        assert rollup_access_logs(db, batch_size=1) == 0